@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+TOKEN = "fake-token"
+
+# AList 任务状态
+STATE_RUNNING = 1
+STATE_SUCCEEDED = 2
+STATE_FAILED = 7
+
+# chunked 模式下超过该大小的响应使用 chunked 编码，与 Go net/http 的缓冲区大小一致
+CHUNKED_MIN_BYTES = 4096
+
+
+class FakeTree:
+    """内存中的目录树，路径 -> {名称: 条目}"""
+
+    def __init__(self):
+        self.dirs: Dict[str, Dict[str, dict]] = {}
+        self.lock = threading.Lock()
+
+    def add(self, parent: str, name: str, is_dir: bool, size: int = 0):
+        """添加条目，父目录不存在时自动创建"""
+        with self.lock:
+            self._ensure_dir(parent)
+            self.dirs[parent][name] = {
+                "name": name,
+                "is_dir": is_dir,
+                "size": size,
+                "modified": "2024-01-01T00:00:00Z",
+                "hash_info": None if is_dir else {"sha1": f"{name}:{size}"}
+            }
+            if is_dir:
+                self._ensure_dir(f"{parent}/{name}")
+
+    def _ensure_dir(self, path: str):
+        if path in self.dirs:
+            return
+        self.dirs[path] = {}
+        parent, _, name = path.rpartition('/')
+        if parent and name:
+            self._ensure_dir(parent)
+            self.dirs[parent].setdefault(name, {
+                "name": name, "is_dir": True, "size": 0,
+                "modified": "2024-01-01T00:00:00Z", "hash_info": None
+            })
+
+    def list(self, path: str) -> Optional[list]:
+        with self.lock:
+            entries = self.dirs.get(path)
+            return None if entries is None else list(entries.values())
+
+    def get(self, path: str) -> Optional[dict]:
+        parent, _, name = path.rpartition('/')
+        with self.lock:
+            return self.dirs.get(parent, {}).get(name)
+
+    def copy(self, src: str, dst_parent: str):
+        """把 src（文件或整个目录）复制到 dst_parent 下"""
+        item = self.get(src)
+        if item is None:
+            return
+        self.add(dst_parent, item["name"], item["is_dir"], item["size"])
+        if item["is_dir"]:
+            for child in self.list(src) or []:
+                self.copy(f"{src}/{child['name']}", f"{dst_parent}/{item['name']}")
+
+    def rename(self, path: str, new_name: str) -> bool:
+        parent, _, name = path.rpartition('/')
+        with self.lock:
+            entries = self.dirs.get(parent, {})
+            item = entries.pop(name, None)
+            if item is None:
+                return False
+            item["name"] = new_name
+            entries[new_name] = item
+            if item["is_dir"]:
+                prefix = f"{path}/"
+                for key in [k for k in self.dirs if k == path or k.startswith(prefix)]:
+                    self.dirs[f"{parent}/{new_name}{key[len(path):]}"] = self.dirs.pop(key)
+        return True
+
+
+class FakeAList:
+    """进程内的 AList 模拟服务器
+
+    实现登录、列目录、获取条目、复制、重命名和复制任务相关接口，
+    每个请求增加 latency 秒延迟，复制任务在 task_duration 秒后完成，
+    fail_rate 比例的任务会以失败结束（按任务序号确定，结果可复现）。
+    batch_fail_rate 比例的批量复制请求（多个文件名）处理到一半时出错：与 AList 一样，出错前的文件名已创建任务，
+    但错误响应中不包含这些任务（按请求序号确定）。
+    chunked 为 True 时，与真实的 AList 一样，较大的响应不带 Content-Length，以 chunked 编码发送。
+    """
+
+    def __init__(self, latency: float = 0.0, task_duration: float = 0.5, fail_rate: float = 0.0,
+                 rate_limit: float = 0.0, token_ttl: float = 0.0, error_rate: float = 0.0,
+                 batch_fail_rate: float = 0.0, chunked: bool = False):
+        self.latency = latency
+        self.chunked = chunked
+        self.task_duration = task_duration
+        self.fail_rate = fail_rate
+        self.batch_fail_rate = batch_fail_rate
+        self.copy_seq = 0
+        self.batch_failures = 0
+        self.rate_limit = rate_limit  # 每个接口每秒最多处理的请求数，超出时模拟网盘限流
+        self.throttled = 0
+        self._windows: Dict[str, list] = {}
+        self.token_ttl = token_ttl  # token 有效期（秒），0 表示不过期
+        self.error_rate = error_rate  # 以 502 响应模拟网络故障的请求比例
+        self.tokens: Dict[str, float] = {}
+        self.logins = 0
+        self.errors = 0
+        self.tree = FakeTree()
+        self.tasks: Dict[str, dict] = {}
+        self.task_lock = threading.Lock()
+        self.task_seq = 0
+        self.requests: Dict[str, int] = {}
+        self.server = None
+        self.thread = None
+
+    def populate(self, root: str, depth: int, dirs_per_level: int, files_per_dir: int,
+                 quote_every: int = 0):
+        """生成测试目录树
+
+        Args:
+            root: 根目录
+            depth: 目录深度
+            dirs_per_level: 每个目录下的子目录数
+            files_per_dir: 每个目录下的文件数
+            quote_every: 每隔多少个文件生成一个带单引号的文件名，0 表示不生成
+        """
+        self.tree._ensure_dir(root)
+        counter = 0
+
+        def fill(path: str, level: int):
+            nonlocal counter
+            for i in range(files_per_dir):
+                counter += 1
+                name = f"file{i}.bin"
+                if quote_every and counter % quote_every == 0:
+                    name = f"it's {i}.bin"
+                self.tree.add(path, name, False, size=counter * 1024)
+            if level < depth:
+                for i in range(dirs_per_level):
+                    self.tree.add(path, f"dir{i}", True)
+                    fill(f"{path}/dir{i}", level + 1)
+
+        fill(root, 1)
+
+    def mirror(self, src_root: str, dst_root: str, fraction: float):
+        """复制源目录结构到目标端，每个目录只复制前 fraction 比例的文件，模拟已同步过一部分"""
+        self.tree._ensure_dir(dst_root)
+        items = self.tree.list(src_root) or []
+        files = [item for item in items if not item["is_dir"]]
+        for item in files[:int(len(files) * fraction)]:
+            self.tree.add(dst_root, item["name"], False, item["size"])
+        for item in items:
+            if item["is_dir"]:
+                self.tree.add(dst_root, item["name"], True)
+                self.mirror(f"{src_root}/{item['name']}", f"{dst_root}/{item['name']}", fraction)
+
+    # ---- 任务 ----
+
+    def _task_view(self, task: dict) -> dict:
+        now = time.monotonic()
+        progress = min(100, int((now - task["start"]) / self.task_duration * 100)) if self.task_duration else 100
+        return {
+            "id": task["id"],
+            "name": task["name"],
+            "state": task["state"],
+            "status": "",
+            "progress": progress,
+            "error": task["error"]
+        }
+
+    def _advance_tasks(self):
+        """完成到期的任务"""
+        now = time.monotonic()
+        with self.task_lock:
+            due = [t for t in self.tasks.values()
+                   if t["state"] == STATE_RUNNING and now - t["start"] >= self.task_duration]
+        for task in due:
+            if task["fail"]:
+                task["state"], task["error"] = STATE_FAILED, "upload throttled"
+            else:
+                self.tree.copy(task["src"], task["dst_dir"])
+                task["state"] = STATE_SUCCEEDED
+
+    def _create_task(self, src_dir: str, dst_dir: str, name: str) -> dict:
+        with self.task_lock:
+            self.task_seq += 1
+            seq = self.task_seq
+            task = {
+                "id": f"task{seq}",
+                "name": f"copy [{src_dir}](/{name}) to [{dst_dir}](/)",
+                "src": f"{src_dir}/{name}",
+                "dst_dir": dst_dir,
+                "start": time.monotonic(),
+                "state": STATE_RUNNING,
+                "error": "",
+                "fail": self.fail_rate > 0 and seq % max(1, round(1 / self.fail_rate)) == 0
+            }
+            self.tasks[task["id"]] = task
+        return task
+
+    # ---- HTTP ----
+
+    def handle(self, method: str, url: str, body: dict) -> dict:
+        """处理一个 API 请求"""
+        parsed = urlparse(url)
+        path = parsed.path
+        with self.task_lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if path == "/api/auth/login":
+            with self.task_lock:
+                self.logins += 1
+                token = f"{TOKEN}-{self.logins}"
+                self.tokens[token] = time.monotonic()
+            return {"code": 200, "data": {"token": token}}
+
+        if self.rate_limit and self._over_limit(path):
+            return {"code": 500, "message": "请求过于频繁，请稍后再试"}
+
+        if path.startswith("/api/admin/task/copy/"):
+            self._advance_tasks()
+            action = path.rsplit('/', 1)[-1]
+            with self.task_lock:
+                tasks = list(self.tasks.values())
+            if action == "undone":
+                return {"code": 200, "data": [self._task_view(t) for t in tasks if t["state"] == STATE_RUNNING]}
+            if action == "done":
+                return {"code": 200, "data": [self._task_view(t) for t in tasks if t["state"] != STATE_RUNNING]}
+            if action == "clear_succeeded":
+                with self.task_lock:
+                    self.tasks = {k: t for k, t in self.tasks.items() if t["state"] != STATE_SUCCEEDED}
+                return {"code": 200}
+            if action == "delete":
+                tid = parse_qs(parsed.query).get("tid", [""])[0]
+                with self.task_lock:
+                    self.tasks.pop(tid, None)
+                return {"code": 200}
+            return {"code": 404, "message": "not found"}
+
+        if path == "/api/fs/list":
+            entries = self.tree.list(body["path"])
+            if entries is None:
+                return {"code": 500, "message": "object not found"}
+            page, per_page = body.get("page", 1), body.get("per_page", 0)
+            content = entries[(page - 1) * per_page:page * per_page] if per_page else entries
+            return {"code": 200, "data": {"content": content, "total": len(entries)}}
+
+        if path == "/api/fs/get":
+            item = self.tree.get(body["path"])
+            if item is None:
+                return {"code": 500, "message": "object not found"}
+            return {"code": 200, "data": dict(item)}
+
+        if path == "/api/fs/copy":
+            names = body["names"]
+            with self.task_lock:
+                self.copy_seq += 1
+                fail = (len(names) > 1 and self.batch_fail_rate > 0
+                        and self.copy_seq % max(1, round(1 / self.batch_fail_rate)) == 0)
+                if fail:
+                    self.batch_failures += 1
+            failed_at = len(names) // 2 if fail else len(names)
+            # 和 AList 一样逐个处理，源文件不存在时在该文件处出错
+            missing = next((i for i, name in enumerate(names[:failed_at])
+                            if self.tree.get(f"{body['src_dir'].rstrip('/')}/{name}") is None), None)
+            if missing is not None:
+                fail, failed_at = False, missing
+            tasks = [
+                {"id": t["id"], "name": t["name"]}
+                for t in (self._create_task(body["src_dir"], body["dst_dir"], name) for name in names[:failed_at])
+            ]
+            if fail:
+                return {"code": 500, "message": f"failed to copy {names[failed_at]}: storage busy"}
+            if missing is not None:
+                return {"code": 500, "message": f"failed to copy {names[missing]}: object not found"}
+            return {"code": 200, "data": {"tasks": tasks}}
+
+        if path == "/api/fs/rename":
+            if self.tree.rename(body["path"], body["name"]):
+                return {"code": 200}
+            return {"code": 500, "message": "object not found"}
+
+        return {"code": 404, "message": "not found"}
+
+    def check_token(self, token: Optional[str]) -> Optional[dict]:
+        """校验 token，无效或过期时返回错误响应"""
+        issued = self.tokens.get(token)
+        if issued is None:
+            return {"code": 401, "message": "token is invalidated"}
+        if self.token_ttl and time.monotonic() - issued > self.token_ttl:
+            return {"code": 401, "message": "token is expired"}
+        return None
+
+    def inject_error(self) -> bool:
+        """按 error_rate 决定是否模拟一次网关错误"""
+        if self.error_rate and random.random() < self.error_rate:
+            with self.task_lock:
+                self.errors += 1
+            return True
+        return False
+
+    def _over_limit(self, path: str) -> bool:
+        """最近一秒内该接口的请求数是否超过 rate_limit"""
+        now = time.monotonic()
+        with self.task_lock:
+            window = [t for t in self._windows.get(path, []) if now - t < 1.0]
+            window.append(now)
+            self._windows[path] = window
+            if len(window) > self.rate_limit:
+                self.throttled += 1
+                return True
+        return False
+
+    def start(self) -> int:
+        """在后台线程启动服务器
+
+        Returns:
+            int: 监听端口
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if fake.inject_error():
+                    data = b"Bad Gateway"
+                    self.send_response(502)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                result = None
+                if self.path != "/api/auth/login":
+                    result = fake.check_token(self.headers.get("Authorization"))
+                if result is None:
+                    result = fake.handle(self.command, self.path, json.loads(raw) if raw else {})
+                data = json.dumps(result).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if fake.chunked and len(data) > CHUNKED_MIN_BYTES:
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for i in range(0, len(data), CHUNKED_MIN_BYTES):
+                        chunk = data[i:i + CHUNKED_MIN_BYTES]
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _serve
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        """停止服务器"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""基准测试
+
+在进程内启动模拟的 AList 服务器，端到端测量列目录、对比、重命名和复制调度的耗时，
+结果写入 JSON，便于在不同版本之间比较。
+
+用法:
+    python -m benchmarks.run --depth 3 --dirs 4 --files 20 --latency 0.005 -o bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.fake_alist import FakeAList
+from src.api import json_decode
+
+SOURCE = "/115"
+TARGET = "/quark"
+LARGE_DIR = "/large"
+
+
+def git_version() -> str:
+    """当前代码版本"""
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def job_dirs(args) -> list:
+    """各同步任务的 (名称, 源目录, 目标目录)"""
+    if args.jobs <= 1:
+        return [("default", SOURCE, TARGET)]
+    return [(f"job{i}", f"{SOURCE}/job{i}", f"{TARGET}/job{i}") for i in range(1, args.jobs + 1)]
+
+
+def make_config(port: int, args) -> dict:
+    """生成指向模拟服务器的服务配置"""
+    jobs = [{"name": name, "source": src, "target": dst} for name, src, dst in job_dirs(args)]
+    return {
+        "alist": {
+            "host": "127.0.0.1",
+            "port": port,
+            "username": "admin",
+            "password": "admin",
+            "use_https": False,
+            "pool_size": args.workers,
+            "async": args.use_async,
+            "stream_list": not args.no_stream,
+            "retry_backoff": 0.05,
+            # 默认不限速，只测代码本身；--throttle 时使用服务的默认限流配置
+            "throttle": None if args.throttle else {
+                name: {"rate": 0} for name in ("list", "copy", "task")
+            }
+        },
+        "sync": {
+            "source": SOURCE,
+            "target": TARGET,
+            "jobs": jobs if args.jobs > 1 else [],
+            "queue_policy": args.queue_policy,
+            "exclude": args.exclude,
+            "list_workers": args.workers,
+            "list_page_size": args.page_size,
+            "retry_times": 3,
+            "retry_interval": args.task_duration,
+            "rename_workers": args.workers
+        },
+        "web": {"host": "127.0.0.1", "port": 0},
+        "task": {
+            "check_interval": max(args.task_duration, 0.05),
+            "min_check_interval": max(args.task_duration / 10, 0.01),
+            "max_check_time": 3600,
+            "max_concurrent_tasks": args.max_tasks,
+            "copy_batch_size": 10
+        },
+        "log": {"file": "logs/app.log"}
+    }
+
+
+def timed(results: dict, name: str, func, **extra):
+    """运行一项测试并记录耗时"""
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    results[name] = dict(seconds=round(seconds, 4), **{k: v(value) for k, v in extra.items()})
+    print(f"{name:<24} {seconds:8.3f}s  {json.dumps(results[name], ensure_ascii=False)}")
+    return value
+
+
+def run(args) -> dict:
+    """运行全部测试"""
+    fake = FakeAList(latency=args.latency, task_duration=args.task_duration, fail_rate=args.fail_rate,
+                     rate_limit=args.provider_limit, token_ttl=args.token_ttl, error_rate=args.error_rate,
+                     batch_fail_rate=args.batch_fail_rate, chunked=args.chunked)
+    for _, src, dst in job_dirs(args):
+        fake.populate(src, args.depth, args.dirs, args.files, quote_every=args.quote_every)
+        fake.mirror(src, dst, args.mirrored)
+    if args.large_dir:
+        fake.populate(LARGE_DIR, 0, 0, args.large_dir)
+    port = fake.start()
+
+    workdir = tempfile.mkdtemp(prefix="alist-bench-")
+    os.chdir(workdir)
+    with open("config.json", "w", encoding="utf-8") as f:
+        json.dump(make_config(port, args), f)
+
+    from main import AListCopyService
+    service = AListCopyService("config.json")
+    logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    if not service.initialize():
+        raise RuntimeError("服务初始化失败")
+
+    results = {}
+    try:
+        timed(results, "get_file_list", lambda: [
+            service.alist.get_file_list(SOURCE) for _ in range(args.list_calls)
+        ], calls=len)
+        results["get_file_list"]["ops_per_second"] = round(
+            args.list_calls / results["get_file_list"]["seconds"], 1
+        )
+        if args.large_dir:
+            from src.api.walker import TreeWalker
+            timed(results, "list_large_dir",
+                  lambda: [page for page in TreeWalker(service.alist, per_page=0).list_pages(LARGE_DIR)],
+                  entries=lambda pages: sum(map(len, pages)))
+
+        jobs = service.jobs
+
+        def count(side: str) -> int:
+            return sum(job.cache.index.count(side) for job in jobs)
+
+        def status_counts() -> dict:
+            counts = {}
+            for job in jobs:
+                for status, n in job.cache.index.status_counts().items():
+                    counts[status] = counts.get(status, 0) + n
+            return counts
+
+        timed(results, "refresh_full", lambda: service.refresh_file_lists(),
+              source_entries=lambda _: count("source"),
+              target_entries=lambda _: count("target"))
+        timed(results, "refresh_incremental", lambda: service.refresh_file_lists())
+
+        pending = timed(results, "get_new_files",
+                        lambda: {job.name: job.cache.get_new_files() for job in jobs},
+                        files=lambda p: sum(map(len, p.values())))
+        before = {name: list(files) for name, files in pending.items()}
+        pending = timed(results, "check_and_rename_files",
+                        lambda: {job.name: service.check_and_rename_files(job, pending[job.name])
+                                 for job in jobs},
+                        files=lambda p: sum(map(len, p.values())),
+                        renamed=lambda after: sum(a != b for name in after
+                                                  for a, b in zip(before[name], after[name])))
+        total = sum(map(len, pending.values()))
+
+        def process_tasks():
+            service.enqueue_copies(pending)
+            service.scheduler.wait_idle()
+
+        timed(results, "process_tasks", process_tasks,
+              files=lambda _: total,
+              slot_utilization=lambda _: round(service.scheduler.utilization(), 4),
+              status=lambda _: status_counts())
+        results["process_tasks"]["files_per_second"] = round(
+            total / results["process_tasks"]["seconds"], 2
+        ) if total else 0
+    finally:
+        if service.scheduler:
+            service.scheduler.stop()
+        service.alist.close()
+        fake.stop()
+
+    return {
+        "version": git_version(),
+        "time": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "json": json_decode.BACKEND,
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+        "throttle": service.alist.throttle.stats(),
+        "pool": service.alist.pool.stats(),
+        "provider_throttled": fake.throttled,
+        "provider_errors": fake.errors,
+        "batch_failures": fake.batch_failures,
+        "copy_tasks": fake.task_seq,
+        "logins": fake.logins,
+        "requests": dict(sorted(fake.requests.items()))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AList 同步基准测试")
+    parser.add_argument("--depth", type=int, default=3, help="目录深度")
+    parser.add_argument("--dirs", type=int, default=4, help="每层子目录数")
+    parser.add_argument("--files", type=int, default=20, help="每个目录的文件数")
+    parser.add_argument("--mirrored", type=float, default=0.5, help="目标端已同步的顶层条目比例")
+    parser.add_argument("--quote-every", type=int, default=25, help="每隔多少个文件生成一个需要重命名的文件名")
+    parser.add_argument("--latency", type=float, default=0.005, help="每个请求的延迟(秒)")
+    parser.add_argument("--task-duration", type=float, default=0.2, help="复制任务耗时(秒)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="复制任务失败比例")
+    parser.add_argument("--batch-fail-rate", type=float, default=0.0,
+                        help="复制请求处理到一半时出错的比例，出错前的文件已创建任务")
+    parser.add_argument("--jobs", type=int, default=1, help="同步任务数")
+    parser.add_argument("--queue-policy", default="fifo",
+                        choices=["fifo", "smallest", "newest", "balanced"], help="待复制队列排序策略")
+    parser.add_argument("--exclude", nargs="*", default=[], help="排除规则，如 dir1/ '*3.bin'")
+    parser.add_argument("--max-tasks", type=int, default=3, help="最大并发任务数")
+    parser.add_argument("--workers", type=int, default=4, help="并发线程数")
+    parser.add_argument("--page-size", type=int, default=200, help="列目录每页条目数")
+    parser.add_argument("--list-calls", type=int, default=200, help="get_file_list 调用次数")
+    parser.add_argument("--large-dir", type=int, default=0,
+                        help="额外生成一个含这么多文件的目录，测量不分页列出它的耗时，0 表示不测")
+    parser.add_argument("--no-stream", action="store_true", help="关闭文件列表响应的流式解析")
+    parser.add_argument("--chunked", action="store_true", help="较大的响应以 chunked 编码发送，同真实的 AList")
+    parser.add_argument("--provider-limit", type=float, default=0,
+                        help="模拟网盘限流：每个接口每秒最多处理的请求数，0 表示不限")
+    parser.add_argument("--throttle", action="store_true", help="启用服务默认的请求限速")
+    parser.add_argument("--token-ttl", type=float, default=0, help="模拟 token 有效期(秒)，0 表示不过期")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="以 502 响应模拟网络故障的请求比例")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="使用异步客户端")
+    parser.add_argument("--verbose", action="store_true", help="输出服务日志")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件")
+    args = parser.parse_args()
+
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    report = run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,25 @@ import time
 import logging
 import threading
 import schedule
+from concurrent.futures import ThreadPoolExecutor
 from src.api.alist_api import AListAPI
-from src.utils.logger import setup_logger
-from src.utils.file_cache import FileCache
+from src.api.async_alist_api import AsyncAListAPI, BlockingAListAPI
+from src.api.walker import WalkError
+from src.api.scheduler import CopyScheduler, CopyJob
+from src.api.retry import RetryPolicy
+from src.api.throttle import Throttle
+from src.utils.logger import setup_logger, logging_stats
+from src.utils.renamer import FileRenamer
+from src.utils.status_bus import StatusBus
+from src.utils.pending_queue import PendingQueue
+from src.utils.statistics import TaskStatistics
+from src.utils.sync_job import SyncJob
+from src.utils.refresh_runner import RefreshRunner, ProgressCallback
+from src.utils.file_index import SOURCE, STATUS_PENDING, STATUS_COPYING, STATUS_DONE, STATUS_FAILED
 from datetime import datetime
 from src.web.app import create_app
 from logging.handlers import RotatingFileHandler
-from typing import List
+from typing import Callable, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -27,18 +39,26 @@ class AListCopyService:
             config_file: 配置文件路径
         """
         self.config = self.load_config(config_file)
-        self.logger = setup_logger(os.path.dirname(self.config['log']['file']))
+        self.logger = setup_logger(os.path.dirname(self.config['log']['file']), self.config['log'])
         self.alist = None
-        self.cache = None
+        self.jobs = []
+        self.scheduler = None
+        self.status_bus = None
         self.web_thread = None
+        # 常驻的复制线程，所有刷新结果都合并进它的队列
+        self.copy_thread = None
+        self._worker_lock = threading.RLock()
         
-        # 添加状态相关属性
-        self.pending_files = []
+        # 添加状态相关属性，计数由复制线程和刷新线程共同更新
+        self._state_lock = threading.Lock()
         self.active_task_count = 0
         self.total_copied = 0
         self.total_errors = 0
         self.start_time = datetime.now()
         self.last_success_time = None
+        self.statistics = TaskStatistics()
+        # 手动刷新和定时刷新共用，同一时间只运行一次，刷新得到的新文件都交给复制线程
+        self.refresher = RefreshRunner(self.refresh_and_queue)
         
     @staticmethod
     def load_config(config_file: str) -> dict:
@@ -53,12 +73,47 @@ class AListCopyService:
             os.makedirs('cache/file_lists', exist_ok=True)
             os.makedirs(os.path.dirname(self.config['log']['file']), exist_ok=True)
             
+            # 共享状态，仅定期写盘用于崩溃恢复
+            self.status_bus = StatusBus(
+                os.path.join('cache/file_lists', "task_status.json"),
+                flush_interval=self.config['web'].get('status_flush_interval', 5)
+            )
+            # 累计复制数跨重启延续
+            _, last_status = self.status_bus.snapshot()
+            self.total_copied = (last_status.get('status_details') or {}).get('total_copied', 0)
+            
             # 初始化 API 客户端
-            self.alist = AListAPI(
-                host=self.config['alist']['host'],
-                port=self.config['alist']['port'],
-                use_https=self.config['alist']['use_https']
+            alist_config = self.config['alist']
+            throttle = Throttle(alist_config.get('throttle'))
+            retry = RetryPolicy(
+                retries=alist_config.get('retries', 3),
+                base_delay=alist_config.get('retry_backoff', 0.5),
+                max_delay=alist_config.get('retry_max_delay', 30)
             )
+            if alist_config.get('async', False):
+                # 异步客户端运行在后台事件循环上，对外仍是同步接口
+                self.alist = BlockingAListAPI(AsyncAListAPI(
+                    host=alist_config['host'],
+                    port=alist_config['port'],
+                    use_https=alist_config['use_https'],
+                    pool_size=alist_config.get('async_pool_size', 32),
+                    idle_timeout=alist_config.get('idle_timeout', 60),
+                    throttle=throttle,
+                    retry=retry,
+                    timeout=alist_config.get('timeout', 30)
+                ))
+            else:
+                self.alist = AListAPI(
+                    host=alist_config['host'],
+                    port=alist_config['port'],
+                    use_https=alist_config['use_https'],
+                    pool_size=alist_config.get('pool_size', 8),
+                    idle_timeout=alist_config.get('idle_timeout', 60),
+                    throttle=throttle,
+                    retry=retry,
+                    timeout=alist_config.get('timeout', 30),
+                    stream_list=alist_config.get('stream_list', True)
+                )
             
             # 登录
             if not self.alist.login(
@@ -68,12 +123,8 @@ class AListCopyService:
                 logger.error("登录失败")
                 return False
                 
-            # 初始化缓存
-            self.cache = FileCache(
-                'cache/file_lists',
-                self.alist,
-                self.config
-            )
+            # 初始化同步任务，每个同步任务有独立的缓存
+            self.jobs = SyncJob.load(self.config, 'cache/file_lists', self.alist)
             
             logger.info("服务初始化成功")
             return True
@@ -84,23 +135,18 @@ class AListCopyService:
             
     def start_web_server(self):
         """启动 Web 服务器"""
-        def refresh_callback():
-            return self.refresh_file_lists()
-            
-        self.web_thread = threading.Thread(
-            target=self._run_web_server,
-            args=(refresh_callback,)
-        )
+        self.web_thread = threading.Thread(target=self._run_web_server)
         self.web_thread.daemon = True
         self.web_thread.start()
         logger.info(f"Web 监控服务已启动: http://localhost:{self.config['web']['port']}")
         
-    def _run_web_server(self, refresh_callback):
+    def _run_web_server(self):
         """Web 服务器运行函数"""
         app = create_app(
             os.path.dirname(self.config['log']['file']),
             'cache/file_lists',
-            refresh_callback
+            self.refresher,
+            self.status_bus
         )
         app.run(
             host=self.config['web']['host'],
@@ -108,101 +154,142 @@ class AListCopyService:
             debug=False
         )
         
-    def refresh_file_lists(self) -> bool:
-        """刷新文件列表缓存"""
+    def list_tree(self, job: SyncJob, is_source: bool, incremental: bool = True) -> int:
+        """递归列出同步任务的源或目标目录树并写入缓存
+        
+        Args:
+            job: 同步任务
+            is_source: 是否是源文件夹
+            incremental: 是否跳过指纹未变化的目录
+            
+        Returns:
+            int: 条目数
+        """
+        incremental = incremental and self.config['sync'].get('incremental', True)
+        return job.cache.refresh_tree(is_source, incremental)
+        
+    def refresh_job(self, job: SyncJob, on_step: Optional[Callable[[str], None]] = None) -> bool:
+        """刷新单个同步任务的文件列表缓存
+        
+        Args:
+            job: 同步任务
+            on_step: 列完源目录、目标目录后各调用一次，参数为说明
+            
+        Returns:
+            bool: 是否有新文件需要复制，新文件保存在 job.new_files
+        """
+        job.new_files = []
         try:
-            logger.info("开始刷新文件列表...")
+            full = job.cache.need_full_refresh(
+                self.config['sync'].get('full_refresh_interval', 604800)
+            )
+            logger.info(f"[{job.name}] 开始{'完整' if full else '增量'}刷新文件列表...")
             
             # 获取源文件夹列表
-            src_files = self.alist.get_file_list(self.config['sync']['source'])
-            if not src_files:
-                logger.error("获取源文件列表失败")
+            try:
+                count = self.list_tree(job, is_source=True, incremental=not full)
+            except WalkError as e:
+                logger.error(f"[{job.name}] 获取源文件列表失败: {e}")
                 return False
+            if on_step:
+                on_step(f"[{job.name}] 已列出源目录，共 {count} 个条目")
                 
             # 获取目标文件夹列表
-            dst_files = self.alist.get_file_list(self.config['sync']['target'])
-            if not dst_files:
-                logger.error("获取目标文件列表失败")
+            try:
+                count = self.list_tree(job, is_source=False, incremental=not full)
+            except WalkError as e:
+                logger.error(f"[{job.name}] 获取目标文件列表失败: {e}")
                 return False
+            if on_step:
+                on_step(f"[{job.name}] 已列出目标目录，共 {count} 个条目")
                 
-            # 保存缓存
-            self.cache.save_file_list(src_files, is_source=True)
-            self.cache.save_file_list(dst_files, is_source=False)
-            self.cache.update_refresh_time()
+            job.cache.update_refresh_time(full)
             
             # 获取新文件
-            new_files = self.cache.get_new_files()
-            if new_files:
-                logger.info(f"发现 {len(new_files)} 个新文件需要复制")
+            job.new_files = job.cache.get_new_files()
+            if job.new_files:
+                logger.info(f"[{job.name}] 发现 {len(job.new_files)} 个新文件需要复制")
                 return True
                 
-            logger.info("没有新文件需要复制")
+            logger.info(f"[{job.name}] 没有新文件需要复制")
             return False
             
         except Exception as e:
-            logger.exception("刷新文件列表失败")
+            logger.exception(f"[{job.name}] 刷新文件列表失败")
             return False
             
-    def check_and_rename_files(self, pending_files: List[str]) -> List[str]:
+    def refresh_file_lists(self, progress: Optional[ProgressCallback] = None) -> bool:
+        """并发刷新所有同步任务的文件列表缓存
+        
+        不要直接从多个线程调用，需要刷新时通过 self.refresher 启动或加入正在进行的刷新。
+        
+        Args:
+            progress: 进度回调 (已完成步数, 总步数, 说明)，每个同步任务分源目录、目标目录两步
+            
+        Returns:
+            bool: 是否有同步任务有新文件需要复制
+        """
+        total = 2 * len(self.jobs)
+        done = 0
+        lock = threading.Lock()
+        
+        def on_step(message: str):
+            nonlocal done
+            with lock:
+                done += 1
+                if progress:
+                    progress(done, total, message)
+        
+        if len(self.jobs) == 1:
+            return self.refresh_job(self.jobs[0], on_step)
+        with ThreadPoolExecutor(max_workers=len(self.jobs), thread_name_prefix="refresh") as pool:
+            return any(list(pool.map(lambda job: self.refresh_job(job, on_step), self.jobs)))
+            
+    def check_and_rename_files(self, job: SyncJob, pending_files: List[str]) -> List[str]:
         """检查并重命名包含特殊字符的文件
         
         Args:
+            job: 同步任务
             pending_files: 待处理的文件列表
             
         Returns:
             List[str]: 处理后的文件列表
         """
-        renamed_files = []
-        src_dir = self.config['sync']['source']
-        rename_count = 0
+        sync = self.config['sync']
+        renamer = FileRenamer(
+            self.alist,
+            job.cache.index,
+            job.source,
+            rules=sync.get('rename_rules'),
+            max_workers=sync.get('rename_workers', 4),
+            per_page=sync.get('list_page_size', 200)
+        )
         total_files = len(pending_files)
+        rename_count = 0
+        lock = threading.Lock()
         
-        logger.info(f"开始检查 {total_files} 个文件的命名...")
+        logger.info(f"[{job.name}] 开始检查 {total_files} 个文件的命名...")
         
-        for file_name in pending_files:
-            if "'" in file_name:  # 检查是否包含单引号
-                # 生成新文件名
-                new_name = file_name.replace("'", "")
-                logger.info(f"准备重命名: {file_name} -> {new_name}")
-                
-                try:
-                    # 执行重命名
-                    result = self.alist.rename_file(src_dir, file_name, new_name)
-                    if result:
-                        renamed_files.append(new_name)
-                        rename_count += 1
-                        logger.info(f"重命名成功 ({rename_count}/{total_files})")
-                        
-                        # 更新状态
-                        self.update_status(
-                            current_task=f"重命名文件: {file_name}",
-                            progress=int((rename_count / total_files) * 100),
-                            total=total_files,
-                            completed=rename_count
-                        )
-                        
-                        # 等待文件系统更新
-                        time.sleep(10)
-                    else:
-                        logger.error(f"重命名失败，保留原文件名: {file_name}")
-                        renamed_files.append(file_name)
-                        self.total_errors += 1
-                except Exception as e:
-                    logger.error(f"重命名过程出错: {e}")
-                    renamed_files.append(file_name)
-                    self.total_errors += 1
-            else:
-                renamed_files.append(file_name)
+        def on_renamed(old_path: str, new_path: str):
+            nonlocal rename_count
+            with lock:
+                rename_count += 1
+                logger.info(f"[{job.name}] 重命名成功 ({rename_count}): {old_path} -> {new_path}")
+                self.update_status(
+                    current_task=f"重命名文件: {old_path}",
+                    progress=int((rename_count / total_files) * 100),
+                    total=total_files,
+                    completed=rename_count
+                )
+        
+        renamed_files, failed = renamer.rename(pending_files, on_renamed)
+        with self._state_lock:
+            self.total_errors += failed
         
         if rename_count > 0:
-            logger.info(f"重命名完成，共处理 {rename_count} 个文件")
-            # 刷新源文件列表缓存
-            src_files = self.alist.get_file_list(self.config['sync']['source'])
-            if src_files:
-                self.cache.save_file_list(src_files, is_source=True)
-                logger.info("已更新源文件列表缓存")
+            logger.info(f"[{job.name}] 重命名完成，共处理 {rename_count} 个文件，已更新源文件索引")
         else:
-            logger.info("没有需要重命名的文件")
+            logger.info(f"[{job.name}] 没有需要重命名的文件")
         
         return renamed_files
 
@@ -211,9 +298,12 @@ class AListCopyService:
         try:
             # 设置定时刷新
             schedule.every().day.at("00:00").do(self.refresh_and_start_tasks)
+            # 定期关闭超过 alist.idle_timeout 的空闲连接，复制线程空闲时不必一直占着连接
+            schedule.every().minute.do(self.alist.evict_idle)
             
-            # 初始启动任务
-            self.refresh_and_start_tasks()
+            # 初始启动任务：复制日志较新时直接恢复上次未完成的任务
+            if not self.resume_tasks():
+                self.refresh_and_start_tasks()
             
             # 主循环只处理定时任务
             while True:
@@ -236,128 +326,209 @@ class AListCopyService:
             logger.info("服务已退出")
 
     def refresh_and_start_tasks(self):
-        """刷新文件列表并启动任务处理"""
+        """刷新文件列表，把新文件交给复制线程"""
         try:
-            # 刷新文件列表
-            has_new_files = self.refresh_file_lists()
-            if not has_new_files:
-                logger.info("没有新文件需要处理")
-                return
-            
-            # 获取待复制文件列表
-            pending_files = self.cache.get_new_files()
-            total_files = len(pending_files)
-            logger.info(f"初始化待复制文件列表，共 {total_files} 个文件")
-            
-            # 检查并重命名文件
-            pending_files = self.check_and_rename_files(pending_files)
-            
-            # 更新初始状态
-            self.update_status(
-                current_task="等待开始复制任务",
-                progress=0,
-                total=len(pending_files),
-                completed=0
-            )
-            
-            # 启动任务处理线程
-            task_thread = threading.Thread(
-                target=self._process_tasks,
-                args=(pending_files, total_files)
-            )
-            task_thread.daemon = True
-            task_thread.start()
-            
+            # 手动刷新正在进行时直接使用其结果
+            self.refresher.run()
         except Exception as e:
             logger.error(f"刷新任务出错: {e}")
 
-    def _process_tasks(self, pending_files: List[str], total_files: int):
-        """处理复制任务的线程函数"""
-        try:
-            no_task_count = 0  # 连续无任务计数
-            
-            while pending_files:
-                try:
-                    # 检查任务状态
-                    undone_tasks = self.alist.check_tasks(
-                        self.config['task']['check_interval'],
-                        self.config['task']['max_check_time']
-                    )
-                    
-                    # 更新活动任务数
-                    if isinstance(undone_tasks, dict) and 'data' in undone_tasks:
-                        tasks = undone_tasks.get('data', [])
-                        if isinstance(tasks, list):
-                            self.active_task_count = len(tasks)
-                            # 记录任务进度
-                            for task in tasks:
-                                task_id = task.get('id', '')
-                                progress = task.get('progress', 0)
-                                status = task.get('status', '')
-                                logger.info(f"任务进度 {task_id}: {progress}% | {status}")
-                            
-                            if not tasks:  # 没有活动任务
-                                no_task_count += 1
-                                if no_task_count >= 5:  # 连续5次没有任务
-                                    logger.info("连续5分钟没有检测到任务，停止任务处理")
-                                    break
-                            else:
-                                no_task_count = 0  # 重置计数
-                    else:
-                        logger.warning("获取任务状态失败")
-                        self.active_task_count = 0
-                    
-                    # 如果有待复制文件，尝试创建新任务
-                    if self.active_task_count < self.config['task']['max_concurrent_tasks']:
-                        # 创建复制任务
-                        task_ids = self.alist.copy_files(
-                            pending_files[:3],  # 每次最多处理3个
-                            self.config['sync']['source'],
-                            self.config['sync']['target'],
-                            self.config['task']['max_concurrent_tasks']
-                        )
-                        
-                        if task_ids:  # 有新任务创建成功
-                            # 更新夸克网盘缓存
-                            dst_files = self.alist.get_file_list(self.config['sync']['target'])
-                            if dst_files:
-                                self.cache.save_file_list(dst_files, is_source=False)
-                                logger.info("已更新夸克网盘缓存")
-                            
-                            completed_count = len(task_ids)
-                            logger.info(f"创建了 {completed_count} 个复制任务")
-                            
-                            # 从待复制列表中移除已创建任务的文件
-                            pending_files = pending_files[completed_count:]
-                            self.pending_files = pending_files
-                            
-                            # 更新状态
-                            self.update_status(
-                                current_task=pending_files[0] if pending_files else "处理中",
-                                progress=int(((total_files - len(pending_files)) / total_files) * 100),
-                                total=total_files,
-                                completed=completed_count
-                            )
-                    
-                    # 等待下一次检查
-                    time.sleep(self.config['task']['check_interval'])
-                    
-                except Exception as e:
-                    logger.error(f"任务处理出错: {e}")
-                    time.sleep(5)
-            
-            logger.info("任务处理完成或已停止")
+    def refresh_and_queue(self, progress: Optional[ProgressCallback] = None) -> bool:
+        """刷新文件列表，并把新文件合并进复制线程的队列
+        
+        由 self.refresher 在后台运行，定时刷新和网页上的手动刷新都经过这里。
+        
+        Args:
+            progress: 进度回调，同 refresh_file_lists
             
+        Returns:
+            bool: 是否有同步任务有新文件需要复制
+        """
+        has_new_files = self.refresh_file_lists(progress)
+        refreshed = time.time()
+        # 复制日志中已提交、尚未核对的任务继续跟踪，不重复提交
+        in_flight = {job.name: job.journal.in_flight() for job in self.jobs}
+        if not has_new_files and not any(in_flight.values()):
+            logger.info("没有新文件需要处理")
+            return has_new_files
+        
+        # 获取待复制文件列表，并检查、重命名文件
+        pending = {}
+        for job in self.jobs:
+            tasks = in_flight[job.name]
+            files = [path for path in job.new_files if path not in tasks]
+            logger.info(f"[{job.name}] 初始化待复制文件列表，共 {len(files)} 个文件")
+            if files:
+                files = self.check_and_rename_files(job, files)
+            pending[job.name] = files
+        
+        with self._worker_lock:
+            if not self._worker_running():
+                # 复制线程启动前用本次刷新结果替换复制日志，丢弃过期的记录
+                for job in self.jobs:
+                    job.journal.reset(pending[job.name], in_flight[job.name], refreshed)
+            self.enqueue_copies(pending, in_flight, refreshed)
+        return has_new_files
+
+    def resume_tasks(self) -> bool:
+        """按复制日志恢复上次未完成的复制任务
+        
+        所有同步任务的待复制队列都是 sync.journal_max_age 秒内刷新得到的时，
+        直接恢复待复制文件和已提交的任务，不再重新列出两端目录。
+        
+        Returns:
+            bool: 是否已恢复
+        """
+        if not any(job.journal.pending() or job.journal.in_flight() for job in self.jobs):
+            return False
+        max_age = self.config['sync'].get('journal_max_age', 3600)
+        stale = [job.name for job in self.jobs if not job.journal.is_fresh(max_age)]
+        if stale:
+            logger.info(f"复制日志已过期，重新刷新文件列表: {', '.join(stale)}")
+            return False
+        
+        pending, in_flight = {}, {}
+        for job in self.jobs:
+            job.journal.compact()
+            pending[job.name], in_flight[job.name] = job.journal.pending(), job.journal.in_flight()
+            logger.info(
+                f"[{job.name}] 从复制日志恢复 {len(pending[job.name])} 个待复制文件，"
+                f"{len(in_flight[job.name])} 个已提交任务"
+            )
+        self.enqueue_copies(pending, in_flight)
+        return True
+
+    def _worker_running(self) -> bool:
+        return self.copy_thread is not None and self.copy_thread.is_alive()
+
+    def enqueue_copies(self, pending: Dict[str, List[str]],
+                       in_flight: Optional[Dict[str, Dict[str, str]]] = None,
+                       refreshed: Optional[float] = None):
+        """把待复制文件合并进复制线程的队列，复制线程未运行时先启动
+        
+        已在队列中、正在复制或等待重试的文件由调度器去重，不会重复提交。
+        in_flight 只交给新启动的调度器：运行中的调度器已在跟踪这些任务，
+        其中已核对结束的任务再交给它会被当作丢失而重新复制。
+        
+        Args:
+            pending: 同步任务名称 -> 待复制文件列表
+            in_flight: 同步任务名称 -> 复制日志中已提交的任务（相对路径 -> 任务ID）
+            refreshed: 文件列表的刷新时间，记入复制日志；从复制日志恢复时为空
+        """
+        in_flight = in_flight or {}
+        with self._worker_lock:
+            started = not self._worker_running()
+            if started:
+                self._start_worker()
+            for job in self.jobs:
+                files = pending.get(job.name, [])
+                tasks = in_flight.get(job.name, {}) if started else {}
+                if not files and not tasks and refreshed is None:
+                    continue
+                self.scheduler.enqueue(
+                    job.name, files,
+                    sizes=job.cache.index.get_sizes(SOURCE, list(files) + list(tasks)),
+                    resumed=tasks,
+                    refreshed=refreshed
+                )
+
+    def _start_worker(self):
+        """创建调度器并启动常驻的复制线程，所有同步任务共用同一组任务槽"""
+        task_config = self.config['task']
+        self.scheduler = CopyScheduler(
+            self.alist,
+            max_tasks=task_config['max_concurrent_tasks'],
+            batch_size=task_config.get('copy_batch_size', 10),
+            min_interval=task_config.get('min_check_interval', 5),
+            max_interval=task_config['check_interval'],
+            retry_times=self.config['sync'].get('retry_times', 3),
+            retry_interval=self.config['sync'].get('retry_interval', 300),
+            large_slots=task_config.get('large_slots')
+        )
+        for job in self.jobs:
+            self.scheduler.add_job(self._copy_job(job))
+        self.copy_thread = threading.Thread(target=self._process_tasks, name="copy-worker", daemon=True)
+        self.copy_thread.start()
+
+    def _process_tasks(self):
+        """复制线程：运行调度器直到服务停止"""
+        def on_tick(tasks: List[dict]):
+            with self._state_lock:
+                self.active_task_count = len(tasks)
+        
+        def on_idle():
+            for job in self.jobs:
+                job.journal.compact()
+            self.update_status("等待新文件", 100, self.scheduler.submitted_count, 0)
+            logger.info(f"本轮复制任务处理完成，连接池: {self.alist.pool.stats()}")
+        
+        try:
+            self.scheduler.run(on_tick=on_tick, on_idle=on_idle)
         except Exception as e:
-            logger.error(f"任务处理线程出错: {e}")
+            logger.exception(f"复制线程出错: {e}")
+
+    def _copy_job(self, job: SyncJob) -> CopyJob:
+        """为同步任务创建调度队列，回调中更新该同步任务的索引、复制日志和统计"""
+        index = job.cache.index
+        sync = self.config['sync']
+        queue = PendingQueue(sync.get('queue_policy', 'fifo'), sync.get('priority_rules'))
+        job.pending_files = queue
+        
+        def on_queued(paths: List[str], refreshed: Optional[float]):
+            job.journal.queue(paths, refreshed)
+        
+        def on_submit(task_ids: dict, remaining: PendingQueue):
+            job.journal.submitted(task_ids)
+            index.set_status(task_ids, STATUS_COPYING, task_ids)
+            for path, task_id in task_ids.items():
+                self.statistics.add_task({"id": task_id, "path": f"{job.name}:{path}"})
+            
+            submitted = self.scheduler.submitted_count
+            total = submitted + sum(len(j.pending_files) for j in self.jobs)
+            self.update_status(
+                current_task=f"[{job.name}] {remaining.peek()}" if remaining else "处理中",
+                progress=int(submitted / total * 100),
+                total=total,
+                completed=len(task_ids)
+            )
+        
+        def on_done(path: str, task: dict):
+            job.journal.done(path)
+            index.set_status([path], STATUS_DONE)
+            # 目录按其下所有文件的大小之和计入复制量；条目已不在源端索引中时记为 0
+            size, _ = index.get_sizes(SOURCE, [path]).get(path, (0, ""))
+            self.statistics.update_task(task.get('id'), "succeeded", 100, size)
+        
+        def on_failed(path: str, task: dict, retry: bool):
+            with self._state_lock:
+                self.total_errors += 1
+            job.journal.failed(path, retry)
+            self.statistics.update_task(task.get('id'), "failed", task.get('progress', 0))
+            index.set_status(
+                [path], STATUS_PENDING if retry else STATUS_FAILED, error=task.get('error')
+            )
+        
+        return CopyJob(
+            job.name, job.source, job.target, queue,
+            on_submit=on_submit, on_done=on_done, on_failed=on_failed, on_queued=on_queued,
+            # 任务成功后只确认该条目并写入目标端索引，不再重新列出整个目标目录
+            verify=job.cache.update_target
+        )
 
     def update_status(self, current_task: str, progress: int, total: int, completed: int):
         """更新任务状态"""
         try:
             # 更新统计信息
-            if completed > 0:
-                self.total_copied += completed
-                self.last_success_time = datetime.now()
+            with self._state_lock:
+                if completed > 0:
+                    self.total_copied += completed
+                    self.last_success_time = datetime.now()
+                counters = {
+                    "active_tasks": self.active_task_count,
+                    "total_copied": self.total_copied,
+                    "total_errors": self.total_errors,
+                    "last_success": self.last_success_time.isoformat() if self.last_success_time else None
+                }
             
             status = {
                 "current_task": current_task,
@@ -366,21 +537,30 @@ class AListCopyService:
                 "completed_tasks": completed,
                 "update_time": datetime.now().isoformat(),
                 "status_details": {
-                    "pending_files": len(self.pending_files),
-                    "active_tasks": self.active_task_count,  # 使用类属性
-                    "total_copied": self.total_copied,
-                    "total_errors": self.total_errors,
-                    "last_success": self.last_success_time.isoformat() if self.last_success_time else None
+                    "pending_files": sum(len(job.pending_files) for job in self.jobs),
+                    "slot_utilization": self.scheduler.utilization() if self.scheduler else 0,
+                    "throttle": self.alist.throttle.stats() if self.alist else {},
+                    "pool": self.alist.pool.stats() if self.alist else {},
+                    **counters
                 },
+                "jobs": [
+                    {
+                        "name": job.name,
+                        "source": job.source,
+                        "target": job.target,
+                        "pending_files": len(job.pending_files)
+                    }
+                    for job in self.jobs
+                ],
                 "statistics": {
                     "start_time": self.start_time.isoformat(),
-                    "running_time": str(datetime.now() - self.start_time)
+                    "running_time": str(datetime.now() - self.start_time),
+                    "copy": self.statistics.get_summary()
                 }
             }
             
-            status_file = os.path.join('cache/file_lists', "task_status.json")
-            with open(status_file, 'w', encoding='utf-8') as f:
-                json.dump(status, f, ensure_ascii=False, indent=2)
+            if self.status_bus:
+                self.status_bus.update(status)
         except Exception as e:
             logger.error(f"更新状态失败: {e}")
 
@@ -388,12 +568,22 @@ class AListCopyService:
         """关闭服务"""
         try:
             logger.info("正在关闭服务...")
+            # 停止任务调度
+            if self.scheduler:
+                self.scheduler.stop()
+            if self.copy_thread and self.copy_thread.is_alive():
+                self.copy_thread.join(timeout=5)
             # 保存当前状态
             self.update_status("服务已停止", 0, 0, 0)
+            if self.status_bus:
+                self.status_bus.close()
             # 等待 web 线程结束
             if self.web_thread and self.web_thread.is_alive():
                 self.web_thread.join(timeout=5)
-            logger.info("服务已关闭")
+            # 关闭连接池
+            if self.alist:
+                self.alist.close()
+            logger.info(f"服务已关闭，日志统计: {logging_stats()}")
         except Exception as e:
             logger.error(f"关闭服务出错: {e}")
 
@@ -3,11 +3,25 @@
 import http.client
 import json
 import logging
-from typing import Dict, Optional, List
-from datetime import datetime
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, List, Tuple
+from urllib.parse import quote
+from src.api import json_decode
+from src.api.connection_pool import ConnectionPool
+from src.api.retry import RetryPolicy, is_token_expired
+from src.api.throttle import Throttle, endpoint_class, is_throttled
+from src.utils.metrics import ALIST_REQUEST_SECONDS, ALIST_REQUEST_ERRORS
 
 logger = logging.getLogger(__name__)
 
+# AList 任务状态：成功
+TASK_SUCCEEDED = 2
+
+# 复制任务名，形如 "copy [/115](/a/b.mkv) to [/quark](/a)"：[挂载路径](存储内路径)
+TASK_NAME_PATTERN = re.compile(r"^copy \[(.*?)\]\((.*)\) to \[(.*?)\]\((.*)\)$")
+
 class AListAPI:
     """AList API 客户端
     
@@ -16,26 +30,164 @@ class AListAPI:
     - 文件列表获取
     - 文件复制
     - 任务状态监控
+    
+    token 失效时自动重新登录；幂等请求遇到网络错误、超时或限流时按抖动指数退避重试。
+    较大的文件列表响应边读取边解析（stream_list），不必先把整个响应体读入内存。
     """
     
-    def __init__(self, host: str, port: int = 5244, use_https: bool = False):
+    def __init__(self, host: str, port: int = 5244, use_https: bool = False,
+                 pool_size: int = 8, idle_timeout: float = 60.0,
+                 throttle: Optional[Throttle] = None, retry: Optional[RetryPolicy] = None,
+                 timeout: float = 30.0, stream_list: bool = True):
         self.host = f"{host}:{port}"
         self.use_https = use_https
+        self.stream_list = stream_list
         self.token = None
-        self.last_check_time = datetime.now()
-        self.active_tasks = set()  # 当前活动的任务ID集合
+        self.throttle = throttle or Throttle()
+        self.retry = retry or RetryPolicy()
+        self._credentials = None
+        self._login_lock = threading.Lock()
+        self.pool = ConnectionPool(
+            self.host,
+            use_https=use_https,
+            max_size=pool_size,
+            idle_timeout=idle_timeout,
+            timeout=timeout
+        )
+    
+    def _send(self, method: str, path: str, payload: str,
+              headers: Optional[Dict[str, str]],
+              reader: Optional[Callable[[http.client.HTTPResponse], Any]] = None,
+              idempotent: bool = False) -> Tuple[int, dict]:
+        """发送一次请求并解析 JSON 响应
+        
+        请求受 throttle 限速和限制并发，被限流、服务端 5xx 或网络出错时自动降低并发上限。
+        给出 reader 时由它读取并解析响应，否则读取完整响应体后解析。
+        
+        Returns:
+            Tuple: (HTTP 状态码, 响应 JSON)
+        """
+        endpoint = path.split('?', 1)[0]
+        name = endpoint_class(endpoint)
+        self.throttle.acquire(name)
+        ok = False
+        start = time.monotonic()
+        try:
+            status, body = self.pool.request(method, path, payload, headers, reader, idempotent)
+            data = body if reader else json_decode.loads(body)
+            # 只有限流、5xx 和网络错误降低并发；"文件不存在"、token 失效等业务错误是正常应答
+            ok = status < 500 and not is_throttled(status, data)
+            return status, data
+        except Exception:
+            ALIST_REQUEST_ERRORS.inc(endpoint=endpoint)
+            raise
+        finally:
+            ALIST_REQUEST_SECONDS.observe(time.monotonic() - start, endpoint=endpoint, method=method)
+            self.throttle.release(name, ok)
     
-    def _get_connection(self) -> http.client.HTTPConnection:
-        """获取 HTTP 连接"""
-        if self.use_https:
-            return http.client.HTTPSConnection(self.host)
-        return http.client.HTTPConnection(self.host)
+    def _request(self, method: str, path: str, payload: str = "",
+                 headers: Optional[Dict[str, str]] = None, idempotent: bool = False,
+                 reader: Optional[Callable[[http.client.HTTPResponse], Any]] = None) -> dict:
+        """发送请求，处理 token 失效和重试
+        
+        - 带 token 的请求返回 401 / token 失效时重新登录，并用新 token 重发一次
+        - idempotent 为 True 时，网络错误、超时和限流响应按 retry 策略重试；
+          非幂等请求（如创建复制任务）出错时可能已在服务端生效，不重试
+        
+        Args:
+            method: HTTP 方法
+            path: 请求路径
+            payload: 请求体
+            headers: 请求头
+            idempotent: 请求是否可以安全地重复发送
+            reader: 自行读取并解析响应的函数，见 _send
+            
+        Returns:
+            dict: 响应 JSON
+        """
+        attempt = 0
+        relogged = False
+        while True:
+            token = self.token
+            try:
+                status, data = self._send(method, path, payload, headers, reader, idempotent)
+            except Exception as e:
+                if not idempotent or attempt >= self.retry.retries:
+                    raise
+                delay = self.retry.delay(attempt)
+                attempt += 1
+                logger.warning(f"请求 {path} 出错，{delay:.1f} 秒后第 {attempt} 次重试: {e!r}")
+                time.sleep(delay)
+                continue
+                
+            if headers and 'Authorization' in headers and not relogged and is_token_expired(status, data):
+                relogged = True
+                if self._relogin(token):
+                    headers = {**headers, 'Authorization': self.token}
+                    continue
+                return data
+                
+            if idempotent and attempt < self.retry.retries and is_throttled(status, data):
+                delay = self.retry.delay(attempt)
+                attempt += 1
+                logger.warning(f"请求 {path} 被限流，{delay:.1f} 秒后第 {attempt} 次重试: {data.get('message')}")
+                time.sleep(delay)
+                continue
+            return data
+    
+    def _relogin(self, stale_token: Optional[str]) -> bool:
+        """token 失效后重新登录，并发请求只登录一次
+        
+        Args:
+            stale_token: 失效请求使用的 token
+            
+        Returns:
+            bool: 是否已有可用的新 token
+        """
+        with self._login_lock:
+            if self.token and self.token != stale_token:
+                return True
+            if not self._credentials:
+                return False
+            logger.warning("token 已失效，重新登录")
+            return self.login(*self._credentials)
 
-    def get_file_list(self, path: str) -> Optional[Dict]:
+    def close(self):
+        """关闭连接池"""
+        self.pool.close()
+
+    def evict_idle(self):
+        """淘汰连接池中超时的空闲连接"""
+        self.pool.evict_idle()
+
+    @staticmethod
+    def _list_reader(item_hook: Optional[Callable[[dict], Any]],
+                     paged: bool) -> Callable[[http.client.HTTPResponse], Any]:
+        """文件列表响应的读取函数：长度超过 STREAM_MIN_BYTES 的响应流式解析，其余整体解析
+
+        AList 较大的响应使用 chunked 编码，长度未知；分页请求的响应大小受 per_page 限制，
+        整体解析更快，只有不分页的请求在长度未知时才流式解析。
+        """
+        def read(response: http.client.HTTPResponse) -> Any:
+            if response.length is None:
+                stream = not paged
+            else:
+                stream = response.length > json_decode.STREAM_MIN_BYTES
+            if stream:
+                return json_decode.load_list(response.read, item_hook)
+            return json_decode.map_content(json_decode.loads(response.read()), item_hook)
+        return read
+
+    def get_file_list(self, path: str, page: int = 1, per_page: int = 0,
+                      item_hook: Optional[Callable[[dict], Any]] = None) -> Optional[Dict]:
         """获取指定路径的文件列表
         
         Args:
             path: 文件夹路径
+            page: 页码
+            per_page: 每页条目数，0 表示不分页
+            item_hook: 每个条目解析后立即调用，content 中保存其返回值；
+                流式解析时原始条目随即释放，不会和转换结果同时留在内存中
             
         Returns:
             Dict: 文件列表数据，失败返回 None
@@ -44,7 +196,6 @@ class AListAPI:
             logger.error("未登录")
             return None
             
-        conn = self._get_connection()
         headers = {
             'Authorization': self.token,
             'Content-Type': 'application/json'
@@ -53,15 +204,21 @@ class AListAPI:
         payload = json.dumps({
             "path": path,
             "password": "",
-            "page": 1,
-            "per_page": 0,
+            "page": page,
+            "per_page": per_page,
             "refresh": False
         })
         
         try:
-            conn.request("POST", "/api/fs/list", payload, headers)
-            response = conn.getresponse()
-            data = json.loads(response.read().decode("utf-8"))
+            if self.stream_list:
+                data = self._request(
+                    "POST", "/api/fs/list", payload, headers, idempotent=True,
+                    reader=self._list_reader(item_hook, per_page > 0)
+                )
+            else:
+                data = json_decode.map_content(
+                    self._request("POST", "/api/fs/list", payload, headers, idempotent=True), item_hook
+                )
             
             if data.get("code") == 200:
                 return data
@@ -70,81 +227,191 @@ class AListAPI:
         except Exception as e:
             logger.error(f"获取文件列表请求失败: {e}")
             return None
-        finally:
-            conn.close()
 
-    def copy_files(self, src_files: List[str], src_dir: str, dst_dir: str, 
-                   max_tasks: int = 3) -> List[str]:
-        """批量复制文件"""
-        task_ids = []
-        
-        # 获取当前未完成任务
-        undone_result = self.get_undone_tasks()
-        if undone_result and undone_result.get("code") == 200:
-            undone_tasks = undone_result.get("data", [])
-            current_task_count = len(undone_tasks)
+    def get_file_info(self, path: str) -> Optional[Dict]:
+        """获取单个文件或目录的信息
+        
+        Args:
+            path: 完整路径
             
-            # 计算可以创建的新任务数量
-            available_slots = max_tasks - current_task_count
+        Returns:
+            Dict: 条目信息；条目不存在时返回空字典，请求失败返回 None
+        """
+        if not self.token:
+            logger.error("未登录")
+            return None
             
-            if available_slots > 0:
-                logger.info(f"当前有 {current_task_count} 个未完成任务，可以创建 {available_slots} 个新任务")
-                
-                # 只创建允许数量的新任务
-                for file_name in src_files[:available_slots]:
-                    result = self.copy_file(f"{src_dir}/{file_name}", dst_dir)
-                    if result and result.get("code") == 200:
-                        tasks = result.get("data", {}).get("tasks", [])
-                        if tasks:
-                            task_id = tasks[0].get("id")
-                            task_ids.append(task_id)
-                            # 不再将任务添加到 active_tasks，因为我们现在关注所有任务
-                            logger.info(f"创建复制任务: {file_name} -> {task_id}")
-                        else:
-                            logger.error(f"复制任务创建失败: {file_name}")
-                            break
+        headers = {
+            'Authorization': self.token,
+            'Content-Type': 'application/json'
+        }
+        
+        payload = json.dumps({"path": path, "password": ""})
+        
+        try:
+            data = self._request("POST", "/api/fs/get", payload, headers, idempotent=True)
+            
+            if data.get("code") == 200:
+                return data.get("data") or {}
+            if "not found" in str(data.get("message", "")):
+                return {}
+            logger.error(f"获取文件信息失败: {path} | {data.get('message')}")
+            return None
+        except Exception as e:
+            logger.error(f"获取文件信息请求失败: {e}")
+            return None
+
+    def submit_copies(self, src_files: List[str], src_dir: str, dst_dir: str,
+                      batch_size: int = 10) -> Tuple[Dict[str, str], List[str]]:
+        """提交复制任务，不检查空闲任务槽
+        
+        调用方已知道空闲槽数时使用，避免重复请求未完成任务列表。
+        
+        Args:
+            src_files: 待复制的相对路径列表，同一父目录下的文件合并提交
+            src_dir: 源目录
+            dst_dir: 目标目录
+            batch_size: 单次复制请求包含的最大文件数
+            
+        Returns:
+            Tuple: (成功创建任务的相对路径 -> 任务ID, 因被限流未创建任务的相对路径)
+        """
+        task_ids = {}
+        throttled = []
+        
+        # 按父目录分组后分批提交
+        groups = {}
+        for path in src_files:
+            parent, _, name = path.rpartition('/')
+            groups.setdefault(parent, {})[name] = path
+            
+        for parent, paths in groups.items():
+            sub_src = f"{src_dir}/{parent}" if parent else src_dir
+            sub_dst = f"{dst_dir}/{parent}" if parent else dst_dir
+            names = list(paths)
+            for i in range(0, len(names), batch_size):
+                batch = names[i:i + batch_size]
+                results, limited = self.copy_batch(sub_src, sub_dst, batch)
+                throttled.extend(paths[name] for name in limited)
+                for name in batch:
+                    task_id = results.get(name)
+                    if task_id:
+                        task_ids[paths[name]] = task_id
+                        logger.info(f"创建复制任务: {paths[name]} -> {task_id}")
                     else:
-                        logger.error(f"复制请求失败: {file_name}")
-                        break
-            else:
-                logger.info(f"当前已有 {current_task_count} 个未完成任务，等待任务完成后再创建新任务")
-                return []  # 返回空列表而不是 None
-        else:
-            logger.error("获取未完成任务列表失败")
+                        logger.error(f"复制任务创建失败: {paths[name]}")
         
-        return task_ids
+        return task_ids, throttled
 
-    def check_tasks(self, check_interval: int = 60, max_check_time: int = 3600) -> bool:
-        """检查任务状态"""
-        current_time = datetime.now()
-        # 更新最后检查时间
-        self.last_check_time = current_time
-        
-        # 获取未完成任务
-        undone_result = self.get_undone_tasks()
-        if undone_result and undone_result.get("code") == 200:
-            undone_tasks = undone_result.get("data", [])
+    def copy_batch(self, src_dir: str, dst_dir: str,
+                   names: List[str]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+        """在一次请求中复制同一目录下的多个文件
+        
+        AList 逐个处理文件名，中途出错时已为前面的文件创建了任务，但错误响应中不包含这些任务。
+        因此失败后先从任务列表中找回已创建的任务，只重试没有任务的文件：
+        整批失败时二分拆分重试，以定位导致失败的文件；被限流或请求出错时不拆分，避免加重限流。
+        被限流的文件单独返回，由调用方稍后重新提交，不计入失败次数。
+        
+        Args:
+            src_dir: 源目录
+            dst_dir: 目标目录
+            names: 文件名列表
             
-            # 更新所有未完成任务的状态
-            for task in undone_tasks:
-                task_id = task.get("id")
-                status = task.get("status", "")
-                progress = task.get("progress", 0)
-                error = task.get("error")
-                
-                if error:
-                    logger.error(f"任务出错 {task_id}: {error}")
-                else:
-                    logger.info(f"任务进度 {task_id}: {progress}% | {status}")
+        Returns:
+            Tuple: (文件名 -> 任务ID，失败为 None; 因被限流未创建任务的文件名)
+        """
+        if not names:
+            return {}, []
+            
+        result = self._copy_names(src_dir, dst_dir, names)
+        if result and result.get("code") == 200:
+            tasks = (result.get("data") or {}).get("tasks") or []
+            return self._match_tasks(src_dir, dst_dir, names, tasks), []
+            
+        message = result.get("message") if result else "请求失败"
+        results = self._find_tasks(src_dir, dst_dir, names, self._list_tasks())
+        if results is None:
+            logger.error(f"复制 {len(names)} 个文件失败，且无法获取任务列表确认已创建的任务: {message}")
+            return {name: None for name in names}, []
+        remaining = [name for name in names if not results[name]]
+        if len(remaining) < len(names):
+            logger.warning(f"复制请求失败，但已为 {len(names) - len(remaining)} 个文件创建了任务: {message}")
+        if not remaining:
+            return results, []
+        if result and is_throttled(0, result):
+            logger.warning(f"复制 {len(remaining)} 个文件被限流: {message}")
+            return results, remaining
+        if len(names) == 1:
+            logger.error(f"复制请求失败: {names[0]} | {message}")
+            return results, []
+        if not result:
+            logger.warning(f"批量复制 {len(remaining)} 个文件请求失败: {message}")
+            return results, []
             
-            # 返回是否可以创建新任务
-            return len(undone_tasks) < 3  # 只要未完成任务总数小于3就可以创建新任务
+        logger.warning(f"批量复制 {len(remaining)} 个文件失败，拆分重试: {message}")
+        mid = len(remaining) // 2
+        throttled = []
+        for part in (remaining[:mid], remaining[mid:]):
+            part_results, part_throttled = self.copy_batch(src_dir, dst_dir, part)
+            results.update(part_results)
+            throttled.extend(part_throttled)
+        return results, throttled
+
+    def _list_tasks(self) -> Optional[List[dict]]:
+        """未完成和已成功的复制任务，任一列表获取失败时返回 None
+        
+        已结束但没有成功的任务不算数，这些文件照常重试。
+        """
+        undone, done = self.get_undone_tasks(), self.get_done_tasks()
+        if not undone or undone.get("code") != 200 or not done or done.get("code") != 200:
+            return None
+        return (undone.get("data") or []) + [t for t in done.get("data") or [] if self.task_succeeded(t)]
+
+    @staticmethod
+    def _find_tasks(src_dir: str, dst_dir: str, names: List[str],
+                    tasks: Optional[List[dict]]) -> Optional[Dict[str, Optional[str]]]:
+        """在任务列表中按完整的源路径和目标目录查找复制请求失败前已创建的任务
         
-        return False
+        Returns:
+            Optional[Dict[str, Optional[str]]]: 文件名 -> 任务ID，没有任务为 None；tasks 为 None 时返回 None
+        """
+        if tasks is None:
+            return None
+        src_dir = src_dir.rstrip('/')
+        dst_dir = dst_dir.rstrip('/')
+        wanted = {f"{src_dir}/{name}": name for name in names}
+        results = {name: None for name in names}
+        for task in tasks:
+            match = TASK_NAME_PATTERN.match(task.get("name", ""))
+            if not match:
+                continue
+            src_mount, src_path, dst_mount, dst_path = match.groups()
+            name = wanted.get(src_mount.rstrip('/') + src_path)
+            if name and not results[name] and (dst_mount.rstrip('/') + dst_path).rstrip('/') == dst_dir:
+                results[name] = task.get("id")
+        return results
+
+    @staticmethod
+    def _match_tasks(src_dir: str, dst_dir: str, names: List[str],
+                     tasks: List[dict]) -> Dict[str, Optional[str]]:
+        """将复制接口返回的任务对应回文件名
+        
+        AList 的任务名形如 "copy [/115](/a) to [/quark](/)"，
+        优先按完整的源路径和目标目录匹配（同 _find_tasks），剩余的任务与文件数量一致时按顺序对应。
+        """
+        results = AListAPI._find_tasks(src_dir, dst_dir, names, tasks)
+        matched = set(results.values())
+        remaining = [task for task in tasks if task.get("id") not in matched]
+        
+        unmatched = [name for name in names if results[name] is None]
+        if unmatched and len(unmatched) == len(remaining):
+            for name, task in zip(unmatched, remaining):
+                results[name] = task.get("id")
+                
+        return results
 
     def login(self, username: str, password: str) -> bool:
         """登录获取 token"""
-        conn = http.client.HTTPConnection(self.host)
         headers = {
             'Content-Type': 'application/json'
         }
@@ -153,12 +420,11 @@ class AListAPI:
             "username": username,
             "password": password
         })
+        self._credentials = (username, password)
         
         try:
             logger.info(f"尝试登录 {self.host}")
-            conn.request("POST", "/api/auth/login", payload, headers)
-            response = conn.getresponse()
-            login_result = json.loads(response.read().decode("utf-8"))
+            login_result = self._request("POST", "/api/auth/login", payload, headers, idempotent=True)
             
             if login_result.get("code") == 200:
                 self.token = login_result.get("data", {}).get("token")
@@ -170,8 +436,6 @@ class AListAPI:
         except Exception as e:
             logger.error(f"登录请求出错: {str(e)}")
             return False
-        finally:
-            conn.close()
     
     def get_undone_tasks(self) -> dict:
         """获取未完成任务列表"""
@@ -179,53 +443,106 @@ class AListAPI:
             logger.error("未登录")
             return {}
             
-        conn = http.client.HTTPConnection(self.host)
         headers = {
             'Authorization': self.token
         }
         
         try:
-            conn.request("GET", "/api/admin/task/copy/undone", "", headers)
-            response = conn.getresponse()
-            data = json.loads(response.read().decode("utf-8"))
-            return data
+            return self._request("GET", "/api/admin/task/copy/undone", "", headers, idempotent=True)
         except Exception as e:
             logger.error(f"获取未完成任务失败: {str(e)}")
             return {}
-        finally:
-            conn.close()
+    
+    def get_done_tasks(self) -> dict:
+        """获取已完成（成功、失败或取消）任务列表"""
+        if not self.token:
+            logger.error("未登录")
+            return {}
+            
+        headers = {
+            'Authorization': self.token
+        }
+        
+        try:
+            return self._request("GET", "/api/admin/task/copy/done", "", headers, idempotent=True)
+        except Exception as e:
+            logger.error(f"获取已完成任务失败: {str(e)}")
+            return {}
+    
+    def clear_succeeded_tasks(self) -> bool:
+        """清除服务端已成功的任务记录"""
+        if not self.token:
+            logger.error("未登录")
+            return False
+            
+        headers = {
+            'Authorization': self.token
+        }
+        
+        try:
+            result = self._request("POST", "/api/admin/task/copy/clear_succeeded", "", headers, idempotent=True)
+            return result.get("code") == 200
+        except Exception as e:
+            logger.error(f"清除已成功任务失败: {str(e)}")
+            return False
+    
+    def delete_task(self, task_id: str) -> bool:
+        """删除服务端的单个任务记录"""
+        if not self.token:
+            logger.error("未登录")
+            return False
+            
+        headers = {
+            'Authorization': self.token
+        }
+        
+        try:
+            result = self._request(
+                "POST", f"/api/admin/task/copy/delete?tid={quote(task_id)}", "", headers, idempotent=True
+            )
+            return result.get("code") == 200
+        except Exception as e:
+            logger.error(f"删除任务失败: {task_id} | {str(e)}")
+            return False
+    
+    @staticmethod
+    def task_succeeded(task: dict) -> bool:
+        """判断已完成的任务是否成功
+        
+        AList 新版本以整数 state 表示任务状态（2 为成功），旧版本为字符串。
+        """
+        if task.get("error"):
+            return False
+        return task.get("state") in (TASK_SUCCEEDED, "succeeded")
     
     def copy_file(self, src_path: str, dst_path: str) -> Optional[Dict]:
         """复制文件"""
+        folder_name = src_path.split('/')[-1]
+        src_dir = src_path.rsplit('/', 1)[0]
+        return self._copy_names(src_dir, dst_path, [folder_name])
+
+    def _copy_names(self, src_dir: str, dst_dir: str, names: List[str]) -> Optional[Dict]:
+        """发送复制请求"""
         if not self.token:
             logger.error("未登录")
             return None
             
-        conn = http.client.HTTPConnection(self.host)
         headers = {
             'Authorization': self.token,
             'Content-Type': 'application/json'
         }
         
-        folder_name = src_path.split('/')[-1]
-        src_dir = src_path.rsplit('/', 1)[0]
-        
         payload = json.dumps({
             "src_dir": src_dir,
-            "dst_dir": dst_path,
-            "names": [folder_name]
+            "dst_dir": dst_dir,
+            "names": names
         })
         
         try:
-            conn.request("POST", "/api/fs/copy", payload, headers)
-            response = conn.getresponse()
-            result = json.loads(response.read().decode("utf-8"))
-            return result
+            return self._request("POST", "/api/fs/copy", payload, headers)
         except Exception as e:
             logger.error(f"复制文件失败: {str(e)}")
             return None
-        finally:
-            conn.close()
 
     def rename_file(self, src_dir: str, src_name: str, new_name: str) -> bool:
         """重命名文件
@@ -242,7 +559,6 @@ class AListAPI:
             logger.error("未登录")
             return False
         
-        conn = self._get_connection()
         headers = {
             'Authorization': self.token,
             'Content-Type': 'application/json'
@@ -255,9 +571,7 @@ class AListAPI:
         })
         
         try:
-            conn.request("POST", "/api/fs/rename", payload, headers)
-            response = conn.getresponse()
-            result = json.loads(response.read().decode("utf-8"))
+            result = self._request("POST", "/api/fs/rename", payload, headers)
             
             if result.get("code") == 200:
                 logger.info(f"重命名成功: {src_name} -> {new_name}")
@@ -268,6 +582,4 @@ class AListAPI:
             return False
         except Exception as e:
             logger.error(f"重命名请求失败: {e}")
-            return False
-        finally:
-            conn.close()
\ No newline at end of file
+            return False
\ No newline at end of file
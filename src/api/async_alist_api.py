@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from src.api import json_decode
+from src.api.alist_api import AListAPI
+from src.api.async_connection_pool import AsyncConnectionPool
+from src.api.retry import RetryPolicy, is_token_expired
+from src.api.throttle import Throttle, endpoint_class, is_throttled
+from src.utils.metrics import ALIST_REQUEST_SECONDS, ALIST_REQUEST_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAListAPI:
+    """AList API 异步客户端
+
+    接口与 AListAPI 一致，所有请求在同一个事件循环上复用连接池，
+    并发请求数由连接池的 max_size 限制。token 失效和重试的处理同 AListAPI。
+    """
+
+    def __init__(self, host: str, port: int = 5244, use_https: bool = False,
+                 pool_size: int = 32, idle_timeout: float = 60.0,
+                 throttle: Optional[Throttle] = None, retry: Optional[RetryPolicy] = None,
+                 timeout: float = 30.0):
+        self.host = f"{host}:{port}"
+        self.use_https = use_https
+        self.token = None
+        self.throttle = throttle or Throttle()
+        self.retry = retry or RetryPolicy()
+        self._credentials = None
+        self._login_lock = None
+        self.pool = AsyncConnectionPool(
+            host, port,
+            use_https=use_https,
+            max_size=pool_size,
+            idle_timeout=idle_timeout,
+            timeout=timeout
+        )
+
+    task_succeeded = staticmethod(AListAPI.task_succeeded)
+    _match_tasks = staticmethod(AListAPI._match_tasks)
+    _find_tasks = staticmethod(AListAPI._find_tasks)
+
+    async def _send(self, method: str, path: str, payload: str,
+                    headers: Optional[Dict[str, str]], idempotent: bool = False) -> Tuple[int, dict]:
+        """发送一次请求并解析 JSON 响应，限流方式同 AListAPI._send"""
+        endpoint = path.split('?', 1)[0]
+        name = endpoint_class(endpoint)
+        await self.throttle.acquire_async(name)
+        ok = False
+        start = time.monotonic()
+        try:
+            status, body = await self.pool.request(method, path, payload, headers, idempotent)
+            data = json_decode.loads(body)
+            ok = status < 500 and not is_throttled(status, data)
+            return status, data
+        except Exception:
+            ALIST_REQUEST_ERRORS.inc(endpoint=endpoint)
+            raise
+        finally:
+            ALIST_REQUEST_SECONDS.observe(time.monotonic() - start, endpoint=endpoint, method=method)
+            self.throttle.release(name, ok)
+
+    async def _request(self, method: str, path: str, payload: str = "",
+                       headers: Optional[Dict[str, str]] = None, idempotent: bool = False) -> dict:
+        """发送请求，处理 token 失效和重试，参数与返回值同 AListAPI._request"""
+        attempt = 0
+        relogged = False
+        while True:
+            token = self.token
+            try:
+                status, data = await self._send(method, path, payload, headers, idempotent)
+            except Exception as e:
+                if not idempotent or attempt >= self.retry.retries:
+                    raise
+                delay = self.retry.delay(attempt)
+                attempt += 1
+                logger.warning(f"请求 {path} 出错，{delay:.1f} 秒后第 {attempt} 次重试: {e!r}")
+                await asyncio.sleep(delay)
+                continue
+
+            if headers and 'Authorization' in headers and not relogged and is_token_expired(status, data):
+                relogged = True
+                if await self._relogin(token):
+                    headers = {**headers, 'Authorization': self.token}
+                    continue
+                return data
+
+            if idempotent and attempt < self.retry.retries and is_throttled(status, data):
+                delay = self.retry.delay(attempt)
+                attempt += 1
+                logger.warning(f"请求 {path} 被限流，{delay:.1f} 秒后第 {attempt} 次重试: {data.get('message')}")
+                await asyncio.sleep(delay)
+                continue
+            return data
+
+    async def _relogin(self, stale_token: Optional[str]) -> bool:
+        """token 失效后重新登录，并发请求只登录一次"""
+        if self._login_lock is None:
+            self._login_lock = asyncio.Lock()
+        async with self._login_lock:
+            if self.token and self.token != stale_token:
+                return True
+            if not self._credentials:
+                return False
+            logger.warning("token 已失效，重新登录")
+            return await self.login(*self._credentials)
+
+    def _headers(self, json_body: bool = True) -> Dict[str, str]:
+        """带认证信息的请求头"""
+        headers = {'Authorization': self.token}
+        if json_body:
+            headers['Content-Type'] = 'application/json'
+        return headers
+
+    async def close(self):
+        """关闭连接池"""
+        self.pool.close()
+
+    async def evict_idle(self):
+        """淘汰连接池中超时的空闲连接，在事件循环中执行"""
+        self.pool.evict_idle()
+
+    async def login(self, username: str, password: str) -> bool:
+        """登录获取 token"""
+        payload = json.dumps({
+            "username": username,
+            "password": password
+        })
+        self._credentials = (username, password)
+        
+        try:
+            logger.info(f"尝试登录 {self.host}")
+            login_result = await self._request(
+                "POST", "/api/auth/login", payload, {'Content-Type': 'application/json'}, idempotent=True
+            )
+            
+            if login_result.get("code") == 200:
+                self.token = login_result.get("data", {}).get("token")
+                if self.token:
+                    logger.info("登录成功")
+                    return True
+            logger.error(f"登录失败: {login_result.get('message', '未知错误')}")
+            return False
+        except Exception as e:
+            logger.error(f"登录请求出错: {str(e)}")
+            return False
+
+    async def get_file_list(self, path: str, page: int = 1, per_page: int = 0,
+                            item_hook: Optional[Callable[[dict], Any]] = None) -> Optional[Dict]:
+        """获取指定路径的文件列表，参数与返回值同 AListAPI.get_file_list
+
+        异步连接池读取完整响应体，这里不做流式解析，只用 json_decode.loads 整体解析后应用 item_hook。
+        """
+        if not self.token:
+            logger.error("未登录")
+            return None
+            
+        payload = json.dumps({
+            "path": path,
+            "password": "",
+            "page": page,
+            "per_page": per_page,
+            "refresh": False
+        })
+        
+        try:
+            data = json_decode.map_content(
+                await self._request("POST", "/api/fs/list", payload, self._headers(), idempotent=True),
+                item_hook
+            )
+            
+            if data.get("code") == 200:
+                return data
+            logger.error(f"获取文件列表失败: {data.get('message')}")
+            return None
+        except Exception as e:
+            logger.error(f"获取文件列表请求失败: {e}")
+            return None
+
+    async def get_file_info(self, path: str) -> Optional[Dict]:
+        """获取单个文件或目录的信息，参数与返回值同 AListAPI.get_file_info"""
+        if not self.token:
+            logger.error("未登录")
+            return None
+            
+        payload = json.dumps({"path": path, "password": ""})
+        
+        try:
+            data = await self._request("POST", "/api/fs/get", payload, self._headers(), idempotent=True)
+            
+            if data.get("code") == 200:
+                return data.get("data") or {}
+            if "not found" in str(data.get("message", "")):
+                return {}
+            logger.error(f"获取文件信息失败: {path} | {data.get('message')}")
+            return None
+        except Exception as e:
+            logger.error(f"获取文件信息请求失败: {e}")
+            return None
+
+    async def _copy_names(self, src_dir: str, dst_dir: str, names: List[str]) -> Optional[Dict]:
+        """发送复制请求"""
+        if not self.token:
+            logger.error("未登录")
+            return None
+            
+        payload = json.dumps({
+            "src_dir": src_dir,
+            "dst_dir": dst_dir,
+            "names": names
+        })
+        
+        try:
+            return await self._request("POST", "/api/fs/copy", payload, self._headers())
+        except Exception as e:
+            logger.error(f"复制文件失败: {str(e)}")
+            return None
+
+    async def copy_batch(self, src_dir: str, dst_dir: str,
+                         names: List[str]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+        """在一次请求中复制同一目录下的多个文件，失败后的处理和返回值同 AListAPI.copy_batch"""
+        if not names:
+            return {}, []
+            
+        result = await self._copy_names(src_dir, dst_dir, names)
+        if result and result.get("code") == 200:
+            tasks = (result.get("data") or {}).get("tasks") or []
+            return self._match_tasks(src_dir, dst_dir, names, tasks), []
+            
+        message = result.get("message") if result else "请求失败"
+        results = self._find_tasks(src_dir, dst_dir, names, await self._list_tasks())
+        if results is None:
+            logger.error(f"复制 {len(names)} 个文件失败，且无法获取任务列表确认已创建的任务: {message}")
+            return {name: None for name in names}, []
+        remaining = [name for name in names if not results[name]]
+        if len(remaining) < len(names):
+            logger.warning(f"复制请求失败，但已为 {len(names) - len(remaining)} 个文件创建了任务: {message}")
+        if not remaining:
+            return results, []
+        if result and is_throttled(0, result):
+            logger.warning(f"复制 {len(remaining)} 个文件被限流: {message}")
+            return results, remaining
+        if len(names) == 1:
+            logger.error(f"复制请求失败: {names[0]} | {message}")
+            return results, []
+        if not result:
+            logger.warning(f"批量复制 {len(remaining)} 个文件请求失败: {message}")
+            return results, []
+            
+        logger.warning(f"批量复制 {len(remaining)} 个文件失败，拆分重试: {message}")
+        mid = len(remaining) // 2
+        throttled = []
+        for part_results, part_throttled in await asyncio.gather(
+            self.copy_batch(src_dir, dst_dir, remaining[:mid]),
+            self.copy_batch(src_dir, dst_dir, remaining[mid:])
+        ):
+            results.update(part_results)
+            throttled.extend(part_throttled)
+        return results, throttled
+
+    async def _list_tasks(self) -> Optional[List[dict]]:
+        """未完成和已成功的复制任务，同 AListAPI._list_tasks"""
+        undone, done = await asyncio.gather(self.get_undone_tasks(), self.get_done_tasks())
+        if not undone or undone.get("code") != 200 or not done or done.get("code") != 200:
+            return None
+        return (undone.get("data") or []) + [t for t in done.get("data") or [] if self.task_succeeded(t)]
+
+    async def submit_copies(self, src_files: List[str], src_dir: str, dst_dir: str,
+                            batch_size: int = 10) -> Tuple[Dict[str, str], List[str]]:
+        """提交复制任务，各批次并发发送，参数与返回值同 AListAPI.submit_copies"""
+        groups = {}
+        for path in src_files:
+            parent, _, name = path.rpartition('/')
+            groups.setdefault(parent, {})[name] = path
+            
+        batches = []
+        for parent, paths in groups.items():
+            sub_src = f"{src_dir}/{parent}" if parent else src_dir
+            sub_dst = f"{dst_dir}/{parent}" if parent else dst_dir
+            names = list(paths)
+            for i in range(0, len(names), batch_size):
+                batches.append((paths, sub_src, sub_dst, names[i:i + batch_size]))
+        
+        results = await asyncio.gather(*(
+            self.copy_batch(sub_src, sub_dst, batch) for _, sub_src, sub_dst, batch in batches
+        ))
+        
+        task_ids = {}
+        throttled = []
+        for (paths, _, _, batch), (result, limited) in zip(batches, results):
+            throttled.extend(paths[name] for name in limited)
+            for name in batch:
+                task_id = result.get(name)
+                if task_id:
+                    task_ids[paths[name]] = task_id
+                    logger.info(f"创建复制任务: {paths[name]} -> {task_id}")
+                else:
+                    logger.error(f"复制任务创建失败: {paths[name]}")
+        return task_ids, throttled
+
+    async def rename_file(self, src_dir: str, src_name: str, new_name: str) -> bool:
+        """重命名文件，参数与返回值同 AListAPI.rename_file"""
+        if not self.token:
+            logger.error("未登录")
+            return False
+        
+        payload = json.dumps({
+            "path": f"{src_dir}/{src_name}",
+            "name": new_name
+        })
+        
+        try:
+            result = await self._request("POST", "/api/fs/rename", payload, self._headers())
+            
+            if result.get("code") == 200:
+                logger.info(f"重命名成功: {src_name} -> {new_name}")
+                return True
+            
+            logger.error(f"重命名失败: {result.get('message')} | 状态码: {result.get('code')}")
+            return False
+        except Exception as e:
+            logger.error(f"重命名请求失败: {e}")
+            return False
+
+    async def _task_request(self, method: str, path: str, action: str) -> dict:
+        """发送任务管理请求（均可安全重发），失败时返回空字典"""
+        if not self.token:
+            logger.error("未登录")
+            return {}
+            
+        try:
+            return await self._request(method, path, "", self._headers(json_body=False), idempotent=True)
+        except Exception as e:
+            logger.error(f"{action}失败: {str(e)}")
+            return {}
+
+    async def get_undone_tasks(self) -> dict:
+        """获取未完成任务列表"""
+        return await self._task_request("GET", "/api/admin/task/copy/undone", "获取未完成任务")
+
+    async def get_done_tasks(self) -> dict:
+        """获取已完成（成功、失败或取消）任务列表"""
+        return await self._task_request("GET", "/api/admin/task/copy/done", "获取已完成任务")
+
+    async def clear_succeeded_tasks(self) -> bool:
+        """清除服务端已成功的任务记录"""
+        result = await self._task_request("POST", "/api/admin/task/copy/clear_succeeded", "清除已成功任务")
+        return result.get("code") == 200
+
+    async def delete_task(self, task_id: str) -> bool:
+        """删除服务端的单个任务记录"""
+        result = await self._task_request(
+            "POST", f"/api/admin/task/copy/delete?tid={quote(task_id)}", f"删除任务 {task_id} "
+        )
+        return result.get("code") == 200
+
+
+class BlockingAListAPI:
+    """在后台事件循环上运行 AsyncAListAPI，对外提供 AListAPI 的同步接口
+
+    现有的同步代码（调度器、重命名等）可以直接使用，
+    需要大量并发的代码（如 AsyncTreeWalker）则通过 loop 和 client 直接提交协程。
+    """
+
+    def __init__(self, client: AsyncAListAPI):
+        self.client = client
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="alist-async", daemon=True)
+        self._thread.start()
+
+    def run(self, coro):
+        """在事件循环上运行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.run(attr(*args, **kwargs))
+        return call
+
+    def close(self):
+        """关闭连接池并停止事件循环"""
+        if self.loop.is_closed():
+            return
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self.loop.close()
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import ssl
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from src.utils.metrics import POOL_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# 复用连接时出现这些异常，通常说明服务端已关闭了空闲连接
+STALE_ERRORS = (
+    ConnectionResetError,
+    BrokenPipeError,
+    asyncio.IncompleteReadError,
+)
+
+
+class AsyncConnection:
+    """基于 asyncio 流的 HTTP/1.1 长连接"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.sent = False  # 最近一次请求是否已完整写出
+
+    def close(self):
+        """关闭连接"""
+        self.writer.close()
+
+    async def _read_body(self, headers: Dict[str, str]) -> Tuple[bytes, bool]:
+        """读取响应体
+
+        Returns:
+            Tuple: (响应体, 连接是否还能复用)
+        """
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = await self.reader.readline()
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # 跳过 trailer
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks), True
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+
+        if "content-length" in headers:
+            return await self.reader.readexactly(int(headers["content-length"])), True
+
+        return await self.reader.read(), False
+
+    async def request(self, host: str, method: str, path: str, body: bytes,
+                      headers: Dict[str, str]) -> Tuple[int, bytes, bool]:
+        """发送请求并读取完整响应
+
+        Returns:
+            Tuple: (HTTP 状态码, 响应体, 连接是否还能复用)
+        """
+        self.sent = False
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+        self.sent = True
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("连接已被服务端关闭")
+        version, status = status_line.split(b" ", 2)[:2]
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            response_headers[key.strip().lower()] = value.strip()
+
+        data, reusable = await self._read_body(response_headers)
+        if response_headers.get("connection", "").lower() == "close" or version != b"HTTP/1.1":
+            reusable = False
+        self.last_used = time.monotonic()
+        return int(status), data, reusable
+
+
+class AsyncConnectionPool:
+    """asyncio 版 HTTP 长连接池
+
+    与 ConnectionPool 行为一致，但在同一个事件循环上复用连接：
+    - max_size 限制同时进行的请求数，超出时挂起等待
+    - 空闲超过 idle_timeout 的连接会被淘汰（借出时，以及定期调用 evict_idle() 时）
+    - 复用的连接已被服务端关闭时自动重连一次，重发规则同 ConnectionPool
+    """
+
+    def __init__(self, host: str, port: int, use_https: bool = False, max_size: int = 32,
+                 idle_timeout: float = 60.0, timeout: float = 30.0):
+        """初始化连接池
+
+        Args:
+            host: 服务器地址
+            port: 服务器端口
+            use_https: 是否使用 HTTPS
+            max_size: 最大并发请求数
+            idle_timeout: 空闲连接的最长保留时间（秒）
+            timeout: 单次请求的超时（秒）
+        """
+        self.host = host
+        self.port = port
+        self.use_https = use_https
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._idle = deque()
+        # 在事件循环中首次使用时创建，兼容 Python 3.8/3.9 的循环绑定
+        self._slots = None
+
+        # 统计计数
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.evictions = 0
+
+    async def _new_connection(self) -> AsyncConnection:
+        """创建新连接"""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host, self.port,
+                ssl=ssl.create_default_context() if self.use_https else None
+            ),
+            self.timeout
+        )
+        return AsyncConnection(reader, writer)
+
+    async def _acquire(self) -> Tuple[AsyncConnection, bool]:
+        """借出连接
+
+        Returns:
+            Tuple: (连接, 是否为复用的连接)
+        """
+        now = time.monotonic()
+        while self._idle:
+            conn = self._idle.pop()
+            if now - conn.last_used > self.idle_timeout:
+                conn.close()
+                self.evictions += 1
+                POOL_EVENTS.inc(event="eviction")
+                continue
+            self.hits += 1
+            POOL_EVENTS.inc(event="hit")
+            return conn, True
+        self.misses += 1
+        POOL_EVENTS.inc(event="miss")
+        return await self._new_connection(), False
+
+    def evict_idle(self):
+        """淘汰所有超时的空闲连接，须在事件循环中调用"""
+        now = time.monotonic()
+        alive = deque()
+        for conn in self._idle:
+            if now - conn.last_used > self.idle_timeout:
+                conn.close()
+                self.evictions += 1
+                POOL_EVENTS.inc(event="eviction")
+            else:
+                alive.append(conn)
+        self._idle = alive
+
+    async def request(self, method: str, path: str, body: Optional[str] = None,
+                      headers: Optional[Dict[str, str]] = None, idempotent: bool = False) -> Tuple[int, bytes]:
+        """发送请求并读取完整响应
+
+        Args:
+            method: HTTP 方法
+            path: 请求路径
+            body: 请求体
+            headers: 请求头
+            idempotent: 请求是否可以安全地重复发送，同 ConnectionPool.request
+
+        Returns:
+            Tuple: (HTTP 状态码, 响应体)
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        payload = (body or "").encode("utf-8")
+        host = f"{self.host}:{self.port}"
+
+        async with self._slots:
+            conn, reused = await self._acquire()
+            reusable = False
+            try:
+                try:
+                    status, data, reusable = await asyncio.wait_for(
+                        conn.request(host, method, path, payload, headers or {}), self.timeout
+                    )
+                except STALE_ERRORS:
+                    if not reused or (conn.sent and not idempotent):
+                        raise
+                    # 空闲连接已失效，换新连接重试一次
+                    conn.close()
+                    self.reconnects += 1
+                    POOL_EVENTS.inc(event="reconnect")
+                    conn = await self._new_connection()
+                    status, data, reusable = await asyncio.wait_for(
+                        conn.request(host, method, path, payload, headers or {}), self.timeout
+                    )
+                return status, data
+            finally:
+                if reusable:
+                    self._idle.append(conn)
+                else:
+                    conn.close()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        while self._idle:
+            self._idle.pop().close()
+
+    def stats(self) -> dict:
+        """获取连接池统计信息"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reconnects": self.reconnects,
+            "evictions": self.evictions,
+            "idle": len(self._idle),
+            "max_size": self.max_size
+        }
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+import http.client
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.utils.metrics import POOL_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# 复用连接时出现这些异常，通常说明服务端已关闭了空闲连接
+STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class ConnectionPool:
+    """HTTP 长连接池
+
+    线程安全地复用 keep-alive 连接，避免每次请求都重新进行 TCP/TLS 握手：
+    - max_size 限制同时借出的连接数，超出时阻塞等待
+    - 空闲超过 idle_timeout 的连接会被淘汰（借出时，以及定期调用 evict_idle() 时）
+    - 复用的连接已被服务端关闭时自动重连一次：发送请求时就出错的总是重发，
+      已发出请求、读取响应时才出错的只重发幂等请求，服务端可能已经处理过非幂等请求
+    """
+
+    def __init__(self, host: str, use_https: bool = False, max_size: int = 8,
+                 idle_timeout: float = 60.0, timeout: float = 30.0):
+        """初始化连接池
+
+        Args:
+            host: 服务器地址（host:port）
+            use_https: 是否使用 HTTPS
+            max_size: 最大连接数
+            idle_timeout: 空闲连接的最长保留时间（秒）
+            timeout: 单个连接的 socket 超时（秒）
+        """
+        self.host = host
+        self.use_https = use_https
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._idle = deque()  # (conn, last_used)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+        # 统计计数
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.evictions = 0
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        """创建新连接"""
+        if self.use_https:
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """借出连接
+
+        Returns:
+            Tuple: (连接, 是否为复用的连接)
+        """
+        self._slots.acquire()
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if now - last_used > self.idle_timeout:
+                    conn.close()
+                    self.evictions += 1
+                    POOL_EVENTS.inc(event="eviction")
+                    continue
+                self.hits += 1
+                POOL_EVENTS.inc(event="hit")
+                return conn, True
+            self.misses += 1
+        POOL_EVENTS.inc(event="miss")
+        return self._new_connection(), False
+
+    def _release(self, conn: http.client.HTTPConnection, reusable: bool):
+        """归还连接"""
+        try:
+            if reusable:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            else:
+                conn.close()
+        finally:
+            self._slots.release()
+
+    def evict_idle(self):
+        """淘汰所有超时的空闲连接"""
+        now = time.monotonic()
+        with self._lock:
+            alive = deque()
+            for conn, last_used in self._idle:
+                if now - last_used > self.idle_timeout:
+                    conn.close()
+                    self.evictions += 1
+                    POOL_EVENTS.inc(event="eviction")
+                else:
+                    alive.append((conn, last_used))
+            self._idle = alive
+
+    def request(self, method: str, path: str, body: Optional[str] = None,
+                headers: Optional[Dict[str, str]] = None,
+                reader: Optional[Callable[[http.client.HTTPResponse], Any]] = None,
+                idempotent: bool = False) -> Tuple[int, Any]:
+        """发送请求并读取完整响应
+
+        Args:
+            method: HTTP 方法
+            path: 请求路径
+            body: 请求体
+            headers: 请求头
+            reader: 自行读取响应的函数，用于边读取边解析；必须读完响应体，连接才能复用
+            idempotent: 请求是否可以安全地重复发送，决定复用的连接在读取响应时失效能否重发
+
+        Returns:
+            Tuple: (HTTP 状态码, 响应体或 reader 的返回值)
+        """
+        conn, reused = self._acquire()
+        reusable = False
+        try:
+            sent = False
+            try:
+                conn.request(method, path, body, headers or {})
+                sent = True
+                response = conn.getresponse()
+            except STALE_ERRORS:
+                if not reused or (sent and not idempotent):
+                    raise
+                # 空闲连接已失效，换新连接重试一次
+                conn.close()
+                with self._lock:
+                    self.reconnects += 1
+                POOL_EVENTS.inc(event="reconnect")
+                conn = self._new_connection()
+                conn.request(method, path, body, headers or {})
+                response = conn.getresponse()
+            data = reader(response) if reader else response.read()
+            reusable = not response.will_close and response.isclosed()
+            return response.status, data
+        finally:
+            self._release(conn, reusable)
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+
+    def stats(self) -> dict:
+        """获取连接池统计信息"""
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reconnects": self.reconnects,
+            "evictions": self.evictions,
+            "idle": idle,
+            "max_size": self.max_size
+        }
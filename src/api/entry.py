@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sys
+from typing import Dict, Optional, Tuple
+
+
+def hash_key(hash_info: Optional[Dict]) -> str:
+    """将 hash_info 序列化为稳定的字符串"""
+    if not hash_info:
+        return ""
+    return json.dumps(hash_info, sort_keys=True)
+
+
+class Entry:
+    """目录树中的一个条目
+
+    列目录时每页结果立即转换为 Entry，只保留同步需要的字段，
+    AList 返回的其余字段（thumb、sign、provider 等）随原始页一起释放。
+    使用 __slots__ 不为每个条目分配字典，父目录路径经过 intern，
+    同一目录下的条目共用同一个字符串，大目录树的内存占用远小于原始 dict。
+    """
+
+    __slots__ = ("name", "parent", "size", "modified", "is_dir", "hash")
+
+    def __init__(self, name: str, parent: str = "", size: int = 0, modified: str = "",
+                 is_dir: bool = False, hash: str = ""):
+        """初始化条目
+
+        Args:
+            name: 名称
+            parent: 父目录的相对路径，根目录下为空字符串
+            size: 大小
+            modified: 修改时间
+            is_dir: 是否目录
+            hash: 序列化后的 hash_info，见 hash_key()
+        """
+        self.name = name
+        self.parent = sys.intern(parent)
+        self.size = size
+        self.modified = modified
+        self.is_dir = is_dir
+        self.hash = hash
+
+    @classmethod
+    def from_item(cls, item: Dict, parent: str = "") -> "Entry":
+        """从 AList 返回的条目创建
+
+        Args:
+            item: /api/fs/list 或 /api/fs/get 返回的条目
+            parent: 父目录的相对路径
+        """
+        return cls(
+            item["name"],
+            parent,
+            item.get("size") or 0,
+            item.get("modified") or "",
+            bool(item.get("is_dir")),
+            hash_key(item.get("hash_info"))
+        )
+
+    @property
+    def path(self) -> str:
+        """相对路径"""
+        return f"{self.parent}/{self.name}" if self.parent else self.name
+
+    def rebase(self, prefix: str) -> "Entry":
+        """把相对路径改为相对 prefix 的上级目录，用于单独列出的子树"""
+        self.parent = sys.intern(f"{prefix}/{self.parent}" if self.parent else prefix)
+        return self
+
+    def fingerprint(self) -> Tuple:
+        """条目指纹 (is_dir, size, modified, hash)，与 FileIndex.get_fingerprint 的格式一致"""
+        return self.is_dir, self.size, self.modified, self.hash
+
+    def __repr__(self) -> str:
+        return f"Entry({self.path!r}, is_dir={self.is_dir}, size={self.size})"
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+import codecs
+import json
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库
+    orjson = None
+
+# 当前使用的 JSON 解码器
+BACKEND = "orjson" if orjson is not None else "json"
+
+# 流式解析每次从响应中读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+# 已知长度且不超过该字节数的响应直接整体解析，流式解析只用于较大或长度未知的响应
+STREAM_MIN_BYTES = 256 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def loads(body: bytes) -> Any:
+    """解析完整的响应体
+
+    安装了 orjson 时直接解析 bytes，否则使用标准库 json；
+    两者都不需要先把响应体解码为 str，省去一份与响应体等大的中间字符串。
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class _Stream:
+    """从 read(size) 读取 UTF-8 文本的缓冲区，只保留尚未解析的部分"""
+
+    def __init__(self, read: Callable[[int], bytes], chunk_size: int):
+        self._read = read
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """读取下一块数据，已到末尾时返回 False"""
+        if self.eof:
+            return False
+        chunk = self._read(self._chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + self._decoder.decode(chunk or b"", final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符但不消耗"""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self.fill():
+                raise ValueError("JSON 数据意外结束")
+
+    def take(self, expected: str) -> str:
+        """消耗下一个非空白字符，它必须是 expected 中的一个"""
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"JSON 格式错误: 位置 {self.pos} 处应为 {expected!r}，实际为 {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """解析下一个完整的 JSON 值，数据不足时继续读取"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # 值恰好在缓冲区末尾结束时可能被截断（如数字），读到更多数据后重新解析
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+    def members(self) -> Iterator[str]:
+        """逐个产出对象的键，调用方在两次迭代之间读取对应的值"""
+        self.take("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.take(":")
+            yield key
+            if self.take(",}") == "}":
+                return
+
+    def elements(self) -> Iterator[Any]:
+        """逐个解析并产出数组元素"""
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.take(",]") == "]":
+                return
+
+    def finish(self):
+        """读完剩余数据，连接才能被复用"""
+        while True:
+            if self.buf[self.pos:].strip(_WHITESPACE):
+                raise ValueError("JSON 数据后有多余内容")
+            self.pos = len(self.buf)
+            if not self.fill():
+                return
+
+
+def iter_list_content(read: Callable[[int], bytes], envelope: Dict,
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """流式解析 /api/fs/list 响应，边读取边逐个产出 data.content 中的条目
+
+    任意时刻内存中只有一块未解析的数据和当前条目，不会同时持有完整的响应体、
+    解码后的字符串和整棵对象树。content 以外的字段（code、message、total 等）
+    照常解析后写入 envelope，其中 data.content 为空列表占位。
+
+    Args:
+        read: 读取响应体的函数，如 HTTPResponse.read
+        envelope: 接收 content 以外字段的字典
+        chunk_size: 每次读取的字节数
+
+    Yields:
+        dict: content 中的条目
+    """
+    stream = _Stream(read, chunk_size)
+    for key in stream.members():
+        if key != "data" or stream.peek() != "{":
+            envelope[key] = stream.value()
+            continue
+        data = envelope["data"] = {}
+        for data_key in stream.members():
+            if data_key == "content" and stream.peek() == "[":
+                data["content"] = []
+                yield from stream.elements()
+            else:
+                data[data_key] = stream.value()
+    stream.finish()
+
+
+def load_list(read: Callable[[int], bytes], item_hook: Optional[Callable[[dict], Any]] = None,
+              chunk_size: int = CHUNK_SIZE) -> Dict:
+    """流式解析 /api/fs/list 响应，结构与 loads 的结果相同
+
+    Args:
+        read: 读取响应体的函数
+        item_hook: 每个条目解析后立即调用，content 中保存其返回值
+        chunk_size: 每次读取的字节数
+    """
+    envelope = {}
+    content = [
+        item_hook(item) if item_hook else item
+        for item in iter_list_content(read, envelope, chunk_size)
+    ]
+    data = envelope.get("data")
+    if isinstance(data, dict) and data.get("content") == []:
+        data["content"] = content
+    return envelope
+
+
+def map_content(data: Any, item_hook: Optional[Callable[[dict], Any]]) -> Any:
+    """对整体解析的 /api/fs/list 响应逐个应用 item_hook，结果与 load_list 一致"""
+    if item_hook is None or not isinstance(data, dict):
+        return data
+    inner = data.get("data")
+    if isinstance(inner, dict) and inner.get("content"):
+        inner["content"] = [item_hook(item) for item in inner["content"]]
+    return data
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import random
+from typing import Optional
+
+# 响应消息中出现这些关键字时视为 token 失效
+TOKEN_EXPIRED_KEYWORDS = ("token is expired", "token is invalidated", "token expired", "invalid token")
+
+
+def is_token_expired(status: int, data: Optional[dict]) -> bool:
+    """根据 HTTP 状态码和响应判断 token 是否已失效"""
+    if status == 401:
+        return True
+    if not data:
+        return False
+    if data.get("code") == 401:
+        return True
+    message = str(data.get("message") or "").lower()
+    return any(keyword in message for keyword in TOKEN_EXPIRED_KEYWORDS)
+
+
+class RetryPolicy:
+    """请求重试策略
+
+    幂等请求遇到网络错误、超时或限流时重试，等待时间按指数增长并加入随机抖动
+    （full jitter），避免大量并发请求在同一时刻重试。
+    """
+
+    def __init__(self, retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0):
+        """初始化重试策略
+
+        Args:
+            retries: 最大重试次数
+            base_delay: 首次重试的最长等待时间（秒）
+            max_delay: 单次重试的最长等待时间（秒）
+        """
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次重试（从 0 开始）前的等待时间"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
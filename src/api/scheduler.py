@@ -0,0 +1,550 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.api.alist_api import AListAPI
+from src.utils.metrics import ACTIVE_TASKS, QUEUE_DEPTH, SLOT_UTILIZATION
+from src.utils.pending_queue import PendingQueue
+
+logger = logging.getLogger(__name__)
+
+
+class CopyJob:
+    """调度器中一个同步任务（源目录 -> 目标目录）的待复制队列"""
+
+    def __init__(self, name: str, src_dir: str, dst_dir: str, pending: PendingQueue,
+                 on_submit: Optional[Callable[[Dict[str, str], PendingQueue], None]] = None,
+                 on_done: Optional[Callable[[str, dict], None]] = None,
+                 on_failed: Optional[Callable[[str, dict, bool], None]] = None,
+                 on_queued: Optional[Callable[[List[str], Optional[float]], None]] = None,
+                 verify: Optional[Callable[[str], Optional[bool]]] = None):
+        """初始化同步任务队列
+
+        Args:
+            name: 同步任务名称
+            src_dir: 源目录
+            dst_dir: 目标目录
+            pending: 待复制文件队列
+            on_submit: 有任务创建成功时调用，参数为 (相对路径 -> 任务ID, 剩余待复制文件队列)
+            on_done: 文件复制成功时调用，参数为 (相对路径, 任务)
+            on_failed: 文件复制失败时调用，参数为 (相对路径, 任务, 是否还会重试)
+            on_queued: 新文件合并进队列后调用，参数为 (新加入的相对路径, 文件列表刷新时间)
+            verify: 任务成功后确认目标端结果，参数为相对路径，
+                返回 False 时按复制失败处理，返回 None 表示无法确认、按成功处理
+        """
+        self.name = name
+        self.src_dir = src_dir
+        self.dst_dir = dst_dir
+        self.pending = pending
+        self.on_submit = on_submit
+        self.on_done = on_done
+        self.on_failed = on_failed
+        self.on_queued = on_queued
+        self.verify = verify
+        self.failures = {}  # 相对路径 -> 失败次数
+        self.in_flight = 0
+
+
+class CopyScheduler:
+    """复制任务调度器
+
+    由一个常驻的调度线程运行 run()，其他线程只通过 enqueue() 提交待复制文件：
+    提交的文件先合并进收件箱，调度线程在每个周期开始时去重后入队，
+    已在队列中、正在复制或等待重试的文件不会重复加入；
+    调度器的其余状态只由调度线程读写。没有工作时调度线程阻塞等待，不再轮询 AList。
+
+    每个周期只读取一次未完成任务列表，立即用待复制文件填满空闲任务槽，
+    并根据任务状态自适应调整轮询间隔：
+    - 有任务接近完成时按最短间隔轮询，任务槽一空出就能补上
+    - 任务槽已满且没有任务接近完成时逐步退避，直到最长间隔
+    - 可随时调用 wake() 立即开始下一个周期
+    同时统计每一轮（从有工作到全部完成）的任务槽利用率（实际占用的槽时间 / 可用槽时间）。
+
+    多个同步任务共用同一组任务槽：空闲槽先按平均份额分给各同步任务
+    （已占用的槽计入份额），剩余的槽按轮转顺序逐个分配，避免空闲。
+    每个同步任务内按其队列的排序策略出队；balanced 策略下最多 large_slots 个槽
+    同时复制大文件，其余的槽复制小文件，大文件不会堵住所有任务槽。
+
+    已提交的任务从未完成列表中消失后，到已完成列表中核对结果，
+    成功的任务再由 CopyJob.verify 逐个确认目标端条目（不重新列出整个目标目录）：
+    失败的文件按指数退避重新排队，最多重试 retry_times 次；
+    创建任务失败的文件同样处理，只有被限流的直接放回队列最前面；
+    核对过的任务记录从服务端清除。
+
+    重启前已提交的任务（enqueue 的 resumed）直接计入在途任务，照常核对而不重新提交；
+    其中在两个任务列表中都找不到的（如 AList 已重启）视为丢失，放回队列重新复制。
+    """
+
+    def __init__(self, alist_client: AListAPI,
+                 max_tasks: int = 3, batch_size: int = 10,
+                 min_interval: float = 5, max_interval: float = 60,
+                 near_done: int = 90, idle_ticks: int = 5,
+                 retry_times: int = 3, retry_interval: float = 300,
+                 large_slots: Optional[int] = None):
+        """初始化调度器
+
+        Args:
+            alist_client: AList API 客户端
+            max_tasks: 所有同步任务共用的最大并发任务数
+            batch_size: 单次复制请求包含的最大文件数
+            min_interval: 最短轮询间隔（秒）
+            max_interval: 最长轮询间隔（秒）
+            near_done: 进度达到该百分比视为接近完成
+            idle_ticks: 连续多少个周期无法提交新任务时退避到最长间隔，
+                在途任务连续多少次核对都找不到时视为丢失
+            retry_times: 单个文件复制失败后的最大重试次数
+            retry_interval: 首次重试的等待时间（秒），之后每次翻倍
+            large_slots: balanced 策略下用于复制大文件的槽数，默认为 max_tasks 的一半
+        """
+        self.alist = alist_client
+        self.max_tasks = max_tasks
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.near_done = near_done
+        self.idle_ticks = idle_ticks
+        self.retry_times = retry_times
+        self.retry_interval = retry_interval
+        self.large_slots = max_tasks // 2 if large_slots is None else large_slots
+
+        self.jobs = {}  # 同步任务名称 -> CopyJob
+        self.in_flight = {}  # 任务ID -> (同步任务名称, 相对路径)
+        self._large_tasks = set()  # 占用大文件槽的任务ID
+        self._resumed = set()  # 重启前提交的任务ID
+        self._missing = {}  # 任务ID -> 连续在两个任务列表中都找不到的次数
+        self._unverified = []  # 已成功、待确认目标端的 (同步任务名称, 相对路径, 任务)
+        self._retries = []  # (可重试时间, 同步任务名称, 相对路径) 小顶堆
+        self._turn = 0
+        self._busy = False  # 本轮是否还有工作
+        self._stalled_ticks = 0  # 连续无法提交新任务的周期数
+        self.interval = min_interval
+        self.active_count = 0
+        self.submitted_count = 0  # 本轮已创建的任务数
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._inbox = {}  # 同步任务名称 -> 待合并的文件
+        self._inbox_lock = threading.Lock()
+
+        # 槽利用率统计
+        self._started = None
+        self._finished = None
+        self._last_tick = None
+        self._busy_slot_time = 0.0
+
+    def add_job(self, job: CopyJob):
+        """注册同步任务，须在 run() 之前调用"""
+        self.jobs[job.name] = job
+
+    def enqueue(self, name: str, paths: List[str], sizes: Optional[Dict] = None,
+                resumed: Optional[Dict[str, str]] = None, refreshed: Optional[float] = None):
+        """提交待复制文件，可在任意线程调用
+
+        多次提交在调度线程取走之前合并为一份。
+
+        Args:
+            name: 同步任务名称
+            paths: 待复制的相对路径
+            sizes: 相对路径 -> (大小, 修改时间)，供队列排序
+            resumed: 重启前已提交的任务，相对路径 -> 任务ID
+            refreshed: 这些文件所依据的文件列表的刷新时间，原样传给 on_queued
+        """
+        if name not in self.jobs:
+            raise KeyError(f"未知的同步任务: {name}")
+        with self._inbox_lock:
+            entry = self._inbox.setdefault(name, {"paths": {}, "sizes": {}, "resumed": {}, "refreshed": None})
+            entry["paths"].update(dict.fromkeys(paths))
+            entry["sizes"].update(sizes or {})
+            entry["resumed"].update(resumed or {})
+            if refreshed is not None:
+                entry["refreshed"] = refreshed
+            self._idle.clear()
+        self.wake()
+
+    def _drain_inbox(self):
+        """把收件箱中的文件去重后并入各同步任务的队列，只在调度线程中调用"""
+        with self._inbox_lock:
+            inbox, self._inbox = self._inbox, {}
+        for name, entry in inbox.items():
+            job = self.jobs[name]
+            adopted = 0
+            for path, task_id in entry["resumed"].items():
+                if task_id not in self.in_flight:
+                    self.in_flight[task_id] = (name, path)
+                    self._resumed.add(task_id)
+                    job.in_flight += 1
+                    adopted += 1
+            if adopted:
+                logger.info(f"[{name}] 继续跟踪重启前提交的 {adopted} 个复制任务")
+
+            busy = {path for job_name, path in self.in_flight.values() if job_name == name}
+            busy.update(path for _, job_name, path in self._retries if job_name == name)
+            added = [path for path in entry["paths"] if path not in busy and path not in job.pending]
+            job.pending.sizes.update(entry["sizes"])
+            job.pending.push(added)
+            skipped = len(entry["paths"]) - len(added)
+            if added or skipped:
+                logger.info(f"[{name}] 加入 {len(added)} 个待复制文件，跳过 {skipped} 个已在处理的文件")
+            if job.on_queued:
+                job.on_queued(added, entry["refreshed"])
+
+    def _has_work(self) -> bool:
+        return bool(self.in_flight or self._retries or self._unverified
+                    or any(job.pending for job in self.jobs.values()))
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的文件全部处理完
+
+        Returns:
+            bool: 是否已空闲
+        """
+        return self._idle.wait(timeout)
+
+    def wake(self):
+        """立即开始下一个周期"""
+        self._wake.set()
+
+    def stop(self):
+        """停止调度"""
+        self._stop.set()
+        self._idle.set()
+        self._wake.set()
+
+    def utilization(self) -> float:
+        """任务槽利用率 (0~1)"""
+        if not self._started or self.max_tasks <= 0:
+            return 0.0
+        elapsed = (self._finished or time.monotonic()) - self._started
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, self._busy_slot_time / (elapsed * self.max_tasks))
+
+    def stats(self) -> dict:
+        """获取调度统计信息"""
+        return {
+            "active_tasks": self.active_count,
+            "max_tasks": self.max_tasks,
+            "in_flight": len(self.in_flight),
+            "waiting_retry": len(self._retries),
+            "submitted": self.submitted_count,
+            "interval": self.interval,
+            "slot_utilization": round(self.utilization(), 4),
+            "jobs": {
+                name: {"pending": len(job.pending), "in_flight": job.in_flight}
+                for name, job in self.jobs.items()
+            }
+        }
+
+    def _next_interval(self, tasks: List[dict], submitted: bool) -> float:
+        """根据当前任务状态计算下一次轮询间隔"""
+        if submitted or any(task.get("progress", 0) >= self.near_done for task in tasks):
+            return self.min_interval
+        if len(tasks) >= self.max_tasks:
+            return min(self.interval * 2, self.max_interval)
+        return max(self.min_interval, min(self.interval, self.max_interval))
+
+    def _account(self, active: int):
+        """累计上一个周期内被占用的槽时间"""
+        now = time.monotonic()
+        if self._last_tick is not None:
+            self._busy_slot_time += min(self.active_count, self.max_tasks) * (now - self._last_tick)
+        self._last_tick = now
+        self.active_count = active
+
+    def _allocate(self, free: int) -> Dict[str, int]:
+        """把空闲任务槽分配给有待复制文件的同步任务
+
+        Returns:
+            Dict[str, int]: 同步任务名称 -> 本周期可提交的文件数
+        """
+        waiting = [job for job in self.jobs.values() if job.pending]
+        if free <= 0 or not waiting:
+            return {}
+
+        # 轮转起点，余下的槽不总是落在同一个同步任务上
+        start = self._turn % len(waiting)
+        waiting = waiting[start:] + waiting[:start]
+        self._turn += 1
+
+        active = sum(1 for job in self.jobs.values() if job.pending or job.in_flight)
+        share = max(1, self.max_tasks // active)
+        quota = {}
+        for job in waiting:
+            count = min(max(0, share - job.in_flight), len(job.pending), free)
+            if count:
+                quota[job.name] = count
+                free -= count
+
+        while free > 0:
+            granted = False
+            for job in waiting:
+                if free > 0 and quota.get(job.name, 0) < len(job.pending):
+                    quota[job.name] = quota.get(job.name, 0) + 1
+                    free -= 1
+                    granted = True
+            if not granted:
+                break
+        return quota
+
+    def _reconcile(self, undone_ids: set):
+        """核对已结束的任务，失败的文件安排重试
+
+        读取未完成列表之后结束的任务也可能出现在已完成列表中，一并核对，
+        以免清除已成功任务时把尚未核对的任务记录一起删掉。
+        """
+        if all(task_id in undone_ids for task_id in self.in_flight):
+            return
+
+        done = self.alist.get_done_tasks()
+        if not done or done.get("code") != 200:
+            logger.warning("获取已完成任务失败，下个周期再核对")
+            return
+
+        done_tasks = {task.get("id"): task for task in done.get("data") or []}
+        # 任务刚结束时可能还未出现在已完成列表中，留到下个周期
+        finished = [task_id for task_id in self.in_flight if task_id in done_tasks]
+        # 两个列表中都没有的任务：重启前提交的直接视为丢失，
+        # 本次提交的可能刚结束还未出现在已完成列表中，连续 idle_ticks 次找不到才视为丢失
+        lost = []
+        for task_id in self.in_flight:
+            if task_id in undone_ids or task_id in done_tasks:
+                self._missing.pop(task_id, None)
+                continue
+            self._missing[task_id] = self._missing.get(task_id, 0) + 1
+            if task_id in self._resumed or self._missing[task_id] >= self.idle_ticks:
+                lost.append(task_id)
+        self._requeue_lost(lost)
+        succeeded = []
+        for task_id in finished:
+            task = done_tasks[task_id]
+            name, path = self.in_flight.pop(task_id)
+            self._large_tasks.discard(task_id)
+            self._resumed.discard(task_id)
+            self._missing.pop(task_id, None)
+            job = self.jobs[name]
+            job.in_flight -= 1
+            if not self.alist.task_succeeded(task):
+                self._failed(job, path, task)
+                self.alist.delete_task(task_id)
+                continue
+            succeeded.append(task_id)
+            if job.verify:
+                # 目标端确认放到提交新任务之后，空出的任务槽先补上
+                self._unverified.append((name, path, task))
+            else:
+                self._succeeded(job, path, task)
+
+        if not succeeded:
+            return
+        if not self.in_flight:
+            self.alist.clear_succeeded_tasks()
+            return
+        # 还有任务在运行，只删除已核对的记录
+        for task_id in succeeded:
+            self.alist.delete_task(task_id)
+
+    def _succeeded(self, job: CopyJob, path: str, task: dict):
+        job.failures.pop(path, None)
+        if job.on_done:
+            job.on_done(path, task)
+
+    def _failed(self, job: CopyJob, path: str, task: dict):
+        """复制失败的文件按指数退避安排重试"""
+        attempts = job.failures.get(path, 0) + 1
+        job.failures[path] = attempts
+        retry = attempts <= self.retry_times
+        if retry:
+            delay = self.retry_interval * 2 ** (attempts - 1)
+            heapq.heappush(self._retries, (time.monotonic() + delay, job.name, path))
+            logger.warning(f"[{job.name}] 复制失败，{delay:.0f} 秒后第 {attempts} 次重试: {path} | {task.get('error')}")
+        else:
+            logger.error(f"[{job.name}] 复制失败，已达最大重试次数: {path} | {task.get('error')}")
+        if job.on_failed:
+            job.on_failed(path, task, retry)
+
+    def _verify_succeeded(self):
+        """逐个确认成功任务的目标端条目，找不到时按复制失败处理"""
+        while self._unverified:
+            # 回调完成后才移出，确认或回调出错时该条目和其余条目留到下个周期
+            name, path, task = self._unverified[0]
+            job = self.jobs[name]
+            if job.verify(path) is False:
+                self._failed(job, path, dict(task, error="任务已成功，但目标端未找到复制结果"))
+            else:
+                self._succeeded(job, path, task)
+            self._unverified.pop(0)
+
+    def _requeue_lost(self, task_ids: List[str]):
+        """无法核对结果的在途任务（两个任务列表中都不存在）放回队列最前面"""
+        for task_id in task_ids:
+            self._resumed.discard(task_id)
+            self._large_tasks.discard(task_id)
+            self._missing.pop(task_id, None)
+            name, path = self.in_flight.pop(task_id)
+            job = self.jobs[name]
+            job.in_flight -= 1
+            job.pending.push([path], front=True)
+            logger.warning(f"[{name}] 复制任务已不存在，重新复制: {path}")
+            if job.on_failed:
+                job.on_failed(path, {"id": task_id, "error": "任务记录已丢失"}, True)
+
+    def _requeue_due_retries(self):
+        """把已到重试时间的文件放回所属同步任务队列的最前面"""
+        now = time.monotonic()
+        due = {}
+        while self._retries and self._retries[0][0] <= now:
+            _, name, path = heapq.heappop(self._retries)
+            due.setdefault(name, []).append(path)
+        for name, paths in due.items():
+            self.jobs[name].pending.push(paths, front=True)
+
+    def _submit(self, quota: Dict[str, int]) -> int:
+        """按分配结果为各同步任务创建复制任务
+
+        Returns:
+            int: 创建成功的任务数
+        """
+        created = 0
+        for name, count in quota.items():
+            job = self.jobs[name]
+            large = job.pending.pop_largest(min(count, max(0, self.large_slots - len(self._large_tasks))))
+            batch = large + job.pending.pop(count - len(large))
+            task_ids, throttled = self.alist.submit_copies(batch, job.src_dir, job.dst_dir, self.batch_size)
+            # 被限流的文件放回队列最前面，下个周期再提交；
+            # 其余创建失败的（如源文件已删除）和任务失败一样退避重试，达到重试次数后放弃
+            job.pending.push(throttled, front=True)
+            limited = set(throttled)
+            for path in batch:
+                if path not in task_ids and path not in limited:
+                    self._failed(job, path, {"error": "创建复制任务失败"})
+            if not task_ids:
+                continue
+            created += len(task_ids)
+            self.submitted_count += len(task_ids)
+            job.in_flight += len(task_ids)
+            self.in_flight.update((task_id, (name, path)) for path, task_id in task_ids.items())
+            self._large_tasks.update(task_ids[path] for path in large if path in task_ids)
+            logger.info(f"[{name}] 创建了 {len(task_ids)} 个复制任务，剩余 {len(job.pending)} 个文件")
+            if job.on_submit:
+                job.on_submit(task_ids, job.pending)
+        return created
+
+    def _start_round(self):
+        """有新工作时开始新一轮，重置轮询间隔和槽利用率统计"""
+        self._started = self._last_tick = time.monotonic()
+        self._finished = None
+        self._busy_slot_time = 0.0
+        self.interval = self.min_interval
+        self.submitted_count = 0
+
+    def _finish_round(self, on_idle: Optional[Callable[[], None]]):
+        """本轮工作全部完成"""
+        self._account(0)
+        self._finished = self._last_tick
+        logger.info(f"待复制文件已全部处理，本轮创建 {self.submitted_count} 个任务，槽利用率 {self.utilization():.1%}")
+        QUEUE_DEPTH.set(0)
+        ACTIVE_TASKS.set(0)
+        if on_idle:
+            on_idle()
+
+    def run(self, on_tick: Optional[Callable[[List[dict]], None]] = None,
+            on_idle: Optional[Callable[[], None]] = None):
+        """调度线程主循环，直到调用 stop()
+
+        单个周期出错（数据库被锁、回调异常等）时记录日志并退避，不会结束调度线程。
+
+        Args:
+            on_tick: 每个周期读取到未完成任务后调用
+            on_idle: 每一轮待复制文件全部处理完后调用
+        """
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                timeout = self._tick(on_tick, on_idle)
+            except Exception:
+                self.interval = min(max(self.interval * 2, self.min_interval), self.max_interval)
+                timeout = self.interval
+                logger.exception(f"调度周期出错，{timeout:.0f} 秒后重试")
+            # timeout 为 None 时没有工作，等待 enqueue() 或 stop() 唤醒
+            self._wake.wait(timeout)
+
+        self._account(self.active_count)
+        logger.info(f"任务调度已停止，槽利用率 {self.utilization():.1%}")
+
+    def _tick(self, on_tick: Optional[Callable[[List[dict]], None]],
+              on_idle: Optional[Callable[[], None]]) -> Optional[float]:
+        """执行一个调度周期
+
+        Returns:
+            Optional[float]: 距下个周期的等待时间（秒），None 表示没有工作、一直等到被唤醒
+        """
+        self._drain_inbox()
+
+        if not self._has_work():
+            if self._busy:
+                self._busy = False
+                self._finish_round(on_idle)
+            with self._inbox_lock:
+                if not self._inbox:
+                    self._idle.set()
+            return None
+        if not self._busy:
+            self._busy = True
+            self._stalled_ticks = 0
+            self._start_round()
+
+        undone = self.alist.get_undone_tasks()
+        if not undone or undone.get("code") != 200:
+            logger.warning("获取任务状态失败")
+            self.interval = min(self.interval * 2, self.max_interval)
+            return self.interval
+
+        tasks = undone.get("data") or []
+        self._account(len(tasks))
+        for task in tasks:
+            logger.info(
+                f"任务进度 {task.get('id', '')}: {task.get('progress', 0)}% | {task.get('status', '')}",
+                extra={"rate_key": f"task-progress:{task.get('id')}"}
+            )
+        if on_tick:
+            on_tick(tasks)
+
+        self._reconcile({task.get("id") for task in tasks})
+        # 到期的重试排在最前面
+        self._requeue_due_retries()
+
+        created = self._submit(self._allocate(self.max_tasks - len(tasks)))
+        submitted = created > 0
+        self._verify_succeeded()
+        if submitted:
+            self._account(len(tasks) + created)
+
+        pending = sum(len(job.pending) for job in self.jobs.values())
+        QUEUE_DEPTH.set(pending + len(self._retries))
+        ACTIVE_TASKS.set(self.active_count)
+        SLOT_UTILIZATION.set(self.utilization())
+        if not self._has_work():
+            return 0
+
+        self.interval = self._next_interval(tasks, submitted)
+        stalled = False
+        if not tasks and not submitted and pending:
+            self._stalled_ticks += 1
+            if self._stalled_ticks >= self.idle_ticks:
+                self._stalled_ticks = 0
+                stalled = True
+                logger.warning(f"连续 {self.idle_ticks} 个周期无法提交新任务，{self.max_interval} 秒后重试")
+        else:
+            self._stalled_ticks = 0
+
+        if stalled:
+            self.interval = self.max_interval
+        elif self._retries and not pending:
+            self.interval = max(self.min_interval,
+                                min(self.interval, self._retries[0][0] - time.monotonic()))
+        logger.debug(f"槽利用率 {self.utilization():.1%}，{self.interval:.0f} 秒后再次检查")
+        return self.interval
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from src.utils.metrics import THROTTLE_CONCURRENCY, THROTTLE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# 接口类别
+CLASS_LIST = "list"
+CLASS_COPY = "copy"
+CLASS_TASK = "task"
+
+# 各类别的默认限制：rate 每秒请求数（0 表示不限），burst 突发请求数，concurrency 最大并发数
+DEFAULT_LIMITS = {
+    CLASS_LIST: {"rate": 50, "burst": 100, "concurrency": 16},
+    CLASS_COPY: {"rate": 5, "burst": 10, "concurrency": 4},
+    CLASS_TASK: {"rate": 10, "burst": 20, "concurrency": 4},
+}
+
+# 响应消息中出现这些关键字时视为被网盘限流
+THROTTLE_KEYWORDS = ("频繁", "限流", "too many", "rate limit", "throttl", "429")
+
+
+def endpoint_class(endpoint: str) -> Optional[str]:
+    """接口所属类别，登录等不限流的接口返回 None"""
+    if endpoint.startswith("/api/admin/task/"):
+        return CLASS_TASK
+    if endpoint in ("/api/fs/copy", "/api/fs/rename"):
+        return CLASS_COPY
+    if endpoint.startswith("/api/fs/"):
+        return CLASS_LIST
+    return None
+
+
+def is_throttled(status: int, data: Optional[dict]) -> bool:
+    """根据 HTTP 状态码和响应判断是否被限流"""
+    if status in (429, 503):
+        return True
+    if not data or data.get("code") == 200:
+        return False
+    if data.get("code") == 429:
+        return True
+    message = str(data.get("message") or "").lower()
+    return any(keyword in message for keyword in THROTTLE_KEYWORDS)
+
+
+def _wake(future: asyncio.Future):
+    """唤醒等待并发名额的协程，已取消的忽略"""
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    """令牌桶限速器，线程安全"""
+
+    def __init__(self, rate: float, burst: float):
+        """初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数，0 表示不限速
+            burst: 桶容量
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, rate: Optional[float] = None) -> float:
+        """预定一个令牌
+
+        Args:
+            rate: 本次使用的补充速率，默认为 self.rate
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        rate = self.rate if rate is None else rate
+        if rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / rate
+
+    def drain(self):
+        """清空桶内积累的令牌，被限流后不再突发请求"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0)
+
+
+class AIMDLimiter:
+    """加性增、乘性减的并发限制器
+
+    每次成功把并发上限增加 increase / 当前上限（约每轮满并发请求加 increase），
+    被限流或请求出错时乘以 decrease，冷却时间内只减一次，
+    避免同一批并发请求的失败把上限连续砍到最低。
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, increase: float = 1.0,
+                 decrease: float = 0.5, cooldown: float = 1.0):
+        """初始化并发限制器
+
+        Args:
+            max_limit: 最大并发数，也是初始值
+            min_limit: 最小并发数
+            increase: 每轮成功增加的并发数
+            decrease: 限流时的缩减系数
+            cooldown: 两次缩减之间的最短间隔（秒）
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(self.max_limit)
+        self.in_use = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        # 等待名额的协程：(事件循环, future)，归还名额时唤醒
+        self._waiters = []
+
+    async def acquire_async(self):
+        """acquire 的异步版本，没有空闲名额时挂起到有名额归还，不轮询"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_use < int(self.limit):
+                    self.in_use += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._cond:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def acquire(self):
+        """获取一个并发名额，没有空闲名额时阻塞"""
+        with self._cond:
+            while self.in_use >= int(self.limit):
+                self._cond.wait()
+            self.in_use += 1
+
+    def release(self, ok: bool) -> bool:
+        """归还名额并根据结果调整上限
+
+        Args:
+            ok: 请求是否成功（未被限流且未出错）
+
+        Returns:
+            bool: 本次是否缩减了上限
+        """
+        with self._cond:
+            self.in_use -= 1
+            decreased = False
+            if ok:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            else:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+                    decreased = True
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+        return decreased
+
+
+class Throttle:
+    """AList 请求限流
+
+    按接口类别（列目录、复制、任务查询）分别用令牌桶限制请求速率，
+    用 AIMD 限制器控制并发数；并发上限缩小时，令牌补充速率按同样比例降低。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, dict]] = None):
+        """初始化限流器
+
+        Args:
+            limits: 类别 -> {rate, burst, concurrency, min_concurrency, cooldown}，
+                未配置的类别和字段使用 DEFAULT_LIMITS
+        """
+        self.buckets = {}
+        self.limiters = {}
+        for name, default in DEFAULT_LIMITS.items():
+            config = {**default, **((limits or {}).get(name) or {})}
+            self.buckets[name] = TokenBucket(config["rate"], config["burst"])
+            self.limiters[name] = AIMDLimiter(
+                config["concurrency"],
+                min_limit=config.get("min_concurrency", 1),
+                cooldown=config.get("cooldown", 1.0)
+            )
+            THROTTLE_CONCURRENCY.set(config["concurrency"], endpoint_class=name)
+
+    def _rate(self, name: str) -> float:
+        """按并发上限的缩减比例调整后的令牌补充速率"""
+        limiter = self.limiters[name]
+        return self.buckets[name].rate * limiter.limit / limiter.max_limit
+
+    def acquire(self, name: Optional[str]):
+        """请求前获取并发名额并等待令牌"""
+        if name is None:
+            return
+        self.limiters[name].acquire()
+        delay = self.buckets[name].reserve(self._rate(name))
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, name: Optional[str]):
+        """acquire 的异步版本，不阻塞事件循环"""
+        if name is None:
+            return
+        await self.limiters[name].acquire_async()
+        delay = self.buckets[name].reserve(self._rate(name))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def release(self, name: Optional[str], ok: bool):
+        """请求结束后归还并发名额
+
+        Args:
+            name: 接口类别
+            ok: 请求是否成功（未被限流且未出错）
+        """
+        if name is None:
+            return
+        limiter = self.limiters[name]
+        if limiter.release(ok):
+            self.buckets[name].drain()
+            THROTTLE_EVENTS.inc(endpoint_class=name)
+            logger.warning(f"{name} 类请求被限流或出错，并发上限降为 {int(limiter.limit)}，"
+                           f"速率降为 {self._rate(name):.1f}/s")
+        THROTTLE_CONCURRENCY.set(int(limiter.limit), endpoint_class=name)
+
+    def stats(self) -> Dict[str, dict]:
+        """各类别当前的并发上限和速率"""
+        return {
+            name: {
+                "concurrency": int(limiter.limit),
+                "max_concurrency": limiter.max_limit,
+                "in_use": limiter.in_use,
+                "rate": round(self._rate(name), 2)
+            }
+            for name, limiter in self.limiters.items()
+        }
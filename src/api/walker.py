@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from src.api.alist_api import AListAPI
+from src.api.async_alist_api import BlockingAListAPI
+from src.api.entry import Entry
+
+logger = logging.getLogger(__name__)
+
+
+class WalkError(Exception):
+    """目录列表获取失败"""
+
+
+def join_path(parent: str, name: str) -> str:
+    """拼接相对路径"""
+    return f"{parent}/{name}" if parent else name
+
+
+def full_path(root: str, rel_path: str) -> str:
+    """将相对路径还原为完整路径"""
+    return f"{root.rstrip('/')}/{rel_path}" if rel_path else root
+
+
+class TreeWalker:
+    """递归目录遍历器
+
+    分页调用 /api/fs/list 获取每个目录的内容，用有界线程池并发列出同级目录，
+    并以流的方式逐条产出条目，不在内存中构建完整的目录树。
+    每一页在列目录的线程中立即转换为紧凑的 Entry，原始 JSON 不会留在队列里。
+    """
+
+    def __init__(self, alist_client: AListAPI, max_workers: int = 4, per_page: int = 200):
+        """初始化遍历器
+
+        Args:
+            alist_client: AList API 客户端
+            max_workers: 并发列目录的线程数
+            per_page: 每页条目数
+        """
+        self.alist = alist_client
+        self.max_workers = max_workers
+        self.per_page = per_page
+        self.dir_count = 0
+        self.excluded_count = 0
+
+    def list_pages(self, path: str, parent: str = "") -> Iterator[List[Entry]]:
+        """分页获取目录内容
+
+        Args:
+            path: 目录的完整路径
+            parent: 该目录的相对路径，作为条目的 parent
+
+        Yields:
+            List[Entry]: 每一页的条目
+        """
+        page = 1
+        fetched = 0
+        item_hook = functools.partial(Entry.from_item, parent=parent)
+        while True:
+            data = self.alist.get_file_list(path, page=page, per_page=self.per_page, item_hook=item_hook)
+            content, fetched, last = self._parse_page(path, data, fetched)
+            if content:
+                yield content
+            if last:
+                return
+            page += 1
+
+    def _parse_page(self, path: str, data: Optional[dict],
+                    fetched: int) -> Tuple[List[Entry], int, bool]:
+        """解析一页列表结果，条目已在解析响应时经 item_hook 转换为 Entry
+
+        Returns:
+            Tuple: (本页条目, 累计条目数, 是否为最后一页)
+        """
+        if not data:
+            raise WalkError(path)
+
+        content = data.get("data", {}).get("content") or []
+        total = data.get("data", {}).get("total", 0)
+        fetched += len(content)
+        last = not content or fetched >= total or len(content) < self.per_page
+        return content, fetched, last
+
+    def _start(self, root: str, results: queue.Queue,
+               stop: threading.Event) -> Tuple[Callable[[str], None], Callable[[], None]]:
+        """启动列目录的工作线程
+
+        每个目录的每一页以 ("page", rel_path, items) 放入 results，
+        结束时放入 ("done", rel_path, None)，出错时放入 ("error", rel_path, 异常)。
+
+        Returns:
+            Tuple: (提交一个目录的函数, 停止并等待所有工作结束的函数)
+        """
+        def put(message):
+            while not stop.is_set():
+                try:
+                    results.put(message, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def list_dir(rel_path: str):
+            try:
+                for items in self.list_pages(full_path(root, rel_path), rel_path):
+                    if stop.is_set():
+                        break
+                    put(("page", rel_path, items))
+                put(("done", rel_path, None))
+            except Exception as e:
+                put(("error", rel_path, e))
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        return lambda rel_path: pool.submit(list_dir, rel_path), lambda: pool.shutdown(wait=True)
+
+    def walk(self, root: str, skip_dir: Optional[Callable[[Entry], bool]] = None,
+             on_dir_done: Optional[Callable[[str], None]] = None,
+             exclude: Optional[Callable[[Entry], bool]] = None,
+             on_page: Optional[Callable[[str], None]] = None) -> Iterator[Entry]:
+        """递归遍历目录树
+
+        条目按广度优先顺序产出，父目录总是先于其子条目出现。
+        条目的 path 为相对 root 的路径。
+
+        Args:
+            root: 根目录
+            skip_dir: 返回 True 时只产出该目录条目本身，不再列出其内容
+            on_dir_done: 某个目录的全部条目产出后调用，参数为其相对路径
+            exclude: 返回 True 的条目不产出，目录也不再列出
+            on_page: 某个目录的一页条目全部产出后、等待下一页之前调用，参数为其相对路径
+
+        Yields:
+            Entry: 文件或目录条目
+
+        Raises:
+            WalkError: 任一目录获取失败
+        """
+        results = queue.Queue(maxsize=self.max_workers * 4)
+        stop = threading.Event()
+        pending = deque([""])
+        running = 0
+        self.dir_count = 0
+        self.excluded_count = 0
+
+        submit, shutdown = self._start(root, results, stop)
+        try:
+            while pending or running:
+                while pending and running < self.max_workers:
+                    submit(pending.popleft())
+                    running += 1
+
+                kind, rel_path, payload = results.get()
+                if kind == "error":
+                    path = full_path(root, rel_path)
+                    logger.error(f"列出目录失败: {path} | {payload}")
+                    raise WalkError(path) from payload
+                if kind == "done":
+                    running -= 1
+                    self.dir_count += 1
+                    if on_dir_done:
+                        on_dir_done(rel_path)
+                    continue
+
+                for item in payload:
+                    if exclude and exclude(item):
+                        self.excluded_count += 1
+                        continue
+                    if item.is_dir and not (skip_dir and skip_dir(item)):
+                        pending.append(item.path)
+                    yield item
+                if on_page:
+                    on_page(rel_path)
+        finally:
+            stop.set()
+            shutdown()
+
+
+class AsyncTreeWalker(TreeWalker):
+    """基于 asyncio 的递归目录遍历器
+
+    与 TreeWalker 的遍历顺序和接口一致，但列目录请求以协程形式
+    在 BlockingAListAPI 的事件循环上并发执行，不受线程数限制，
+    适合目录很多、单次请求延迟较高的目录树。
+    """
+
+    def __init__(self, alist_client: BlockingAListAPI, max_workers: int = 32, per_page: int = 200):
+        """初始化遍历器
+
+        Args:
+            alist_client: 运行在后台事件循环上的异步 AList 客户端
+            max_workers: 同时列出的目录数
+            per_page: 每页条目数
+        """
+        super().__init__(alist_client, max_workers=max_workers, per_page=per_page)
+
+    def _start(self, root: str, results: queue.Queue,
+               stop: threading.Event) -> Tuple[Callable[[str], None], Callable[[], None]]:
+        """在事件循环上启动列目录协程，消息格式同 TreeWalker._start"""
+        client = self.alist.client
+        loop = self.alist.loop
+        futures = set()
+
+        async def put(message):
+            while not stop.is_set():
+                try:
+                    results.put_nowait(message)
+                    return
+                except queue.Full:
+                    await asyncio.sleep(0.05)
+
+        async def list_dir(rel_path: str):
+            path = full_path(root, rel_path)
+            try:
+                page = 1
+                fetched = 0
+                item_hook = functools.partial(Entry.from_item, parent=rel_path)
+                while not stop.is_set():
+                    data = await client.get_file_list(path, page=page, per_page=self.per_page, item_hook=item_hook)
+                    content, fetched, last = self._parse_page(path, data, fetched)
+                    if content:
+                        await put(("page", rel_path, content))
+                    if last:
+                        break
+                    page += 1
+                await put(("done", rel_path, None))
+            except Exception as e:
+                await put(("error", rel_path, e))
+
+        def submit(rel_path: str):
+            future = asyncio.run_coroutine_threadsafe(list_dir(rel_path), loop)
+            futures.add(future)
+            future.add_done_callback(futures.discard)
+
+        def shutdown():
+            for future in list(futures):
+                try:
+                    future.result(timeout=self.alist.client.pool.timeout)
+                except Exception:
+                    future.cancel()
+
+        return submit, shutdown
@@ -1,9 +1,16 @@
 import json
 import os
-from typing import List, Tuple, Dict
+import time
+from typing import List, Dict, Optional
 from datetime import datetime
 import logging
 from src.api.alist_api import AListAPI
+from src.api.async_alist_api import BlockingAListAPI
+from src.api.entry import Entry
+from src.api.walker import TreeWalker, AsyncTreeWalker, WalkError, full_path
+from src.utils.file_index import FileIndex, SOURCE, TARGET
+from src.utils.metrics import REFRESH_SECONDS
+from src.utils.path_filter import PathFilter
 
 logger = logging.getLogger(__name__)
 
@@ -12,26 +19,36 @@ class FileCache:
     
     负责管理115网盘和夸克网盘的文件列表缓存，
     包括缓存的读取、更新和对比功能。
+    
+    目录树保存在 SQLite 索引中，按目录增量写入；
+    目录指纹 (size, modified, hash_info) 未变化的子树直接沿用索引，不再重新列出。
+    被 sync.exclude / sync.include 排除的条目在列目录时直接剪掉，不会列出其子树。
     """
     
-    def __init__(self, cache_dir: str, alist_client: AListAPI, config: dict):
+    def __init__(self, cache_dir: str, alist_client: AListAPI, config: dict,
+                 source: str = None, target: str = None):
         """初始化缓存管理器
         
         Args:
             cache_dir: 缓存目录路径
             alist_client: AList API 客户端
             config: 配置信息
+            source: 源目录，默认为 sync.source
+            target: 目标目录，默认为 sync.target
         """
         self.cache_dir = cache_dir
         self.alist = alist_client
         self.config = config
+        self.source = source or config['sync']['source']
+        self.target = target or config['sync']['target']
+        self.filter = PathFilter(config['sync'].get('exclude'), config['sync'].get('include'))
+        self.filter_rules = [config['sync'].get('exclude') or [], config['sync'].get('include') or []]
         
         if not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
         
         # 缓存文件路径
-        self.src_cache_file = os.path.join(cache_dir, "115_files.json")
-        self.dst_cache_file = os.path.join(cache_dir, "quark_files.json")
+        self.index = FileIndex(os.path.join(cache_dir, "file_index.db"))
         self.last_refresh_file = os.path.join(cache_dir, "last_refresh.json")
     
     def need_refresh(self, refresh_interval: int) -> bool:
@@ -54,48 +71,227 @@ class FileCache:
             logger.error(f"检查刷新时间失败: {e}")
             return True
     
-    def update_refresh_time(self):
-        """更新最后刷新时间"""
+    def _read_refresh_info(self) -> dict:
+        """读取刷新时间记录"""
+        try:
+            if os.path.exists(self.last_refresh_file):
+                with open(self.last_refresh_file, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"读取刷新时间失败: {e}")
+        return {}
+    
+    def need_full_refresh(self, full_refresh_interval: int) -> bool:
+        """检查是否需要完整刷新（不使用增量跳过）
+        
+        部分网盘的目录修改时间不会随深层文件变化而更新，
+        因此需要定期完整遍历一次；过滤规则变化后也需要完整遍历，
+        让未变化的目录也按新规则重新列出。
+        
+        Args:
+            full_refresh_interval: 完整刷新间隔（秒）
+        """
+        info = self._read_refresh_info()
+        full_time = info.get('full_time')
+        if not full_time or info.get('filter_rules', [[], []]) != self.filter_rules:
+            return True
+        last_time = datetime.fromisoformat(full_time)
+        return (datetime.now() - last_time).total_seconds() > full_refresh_interval
+    
+    def update_refresh_time(self, full: bool = False):
+        """更新最后刷新时间
+        
+        Args:
+            full: 本次是否为完整刷新
+        """
+        info = self._read_refresh_info()
+        now = datetime.now().isoformat()
+        info['time'] = now
+        if full:
+            info['full_time'] = now
+            info['filter_rules'] = self.filter_rules
         with open(self.last_refresh_file, 'w') as f:
-            json.dump({'time': datetime.now().isoformat()}, f)
+            json.dump(info, f)
     
-    def save_file_list(self, file_list: Dict, is_source: bool = True):
-        """保存文件列表到缓存
+    def refresh_tree(self, is_source: bool, incremental: bool = True) -> int:
+        """递归列出源或目标目录树并写入索引
+        
+        每一页条目写入后立即提交，等待下一页时不占用数据库写锁，
+        复制线程的状态更新不会被长时间的刷新阻塞；
+        每个目录列出完成后再删除其下已不存在的条目并提交。
+        需要展开的目录条目在其内容列出完成后才写入，
+        遍历中途出错时，下次刷新仍会重新列出这些目录。
         
         Args:
-            file_list: 文件列表数据
             is_source: 是否是源文件夹（115网盘）
+            incremental: 是否跳过指纹未变化的目录
+            
+        Returns:
+            int: 本次列出的条目数
+            
+        Raises:
+            WalkError: 目录列表获取失败
         """
-        cache_file = self.src_cache_file if is_source else self.dst_cache_file
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(file_list, f, ensure_ascii=False, indent=2)
+        root = self.source if is_source else self.target
+        side = SOURCE if is_source else TARGET
+        walker = self._walker()
+        
+        reused = set()
+        children = {"": []}
+        expanding = {}
+        excluded = {}
+        
+        def exclude(item: Entry) -> bool:
+            if not self.filter.excluded(item.path, item.is_dir):
+                return False
+            excluded.setdefault(item.parent, []).append(item.name)
+            return True
+        
+        def skip_dir(item: Entry) -> bool:
+            if incremental and self.index.get_fingerprint(side, item.path) == item.fingerprint():
+                reused.add(item.path)
+                return True
+            return False
+        
+        def on_dir_done(rel_path: str):
+            item = expanding.pop(rel_path, None)
+            if item is not None:
+                self.index.upsert(side, item)
+            self.index.finish_dir(side, rel_path, children.pop(rel_path, ()), excluded.pop(rel_path, ()))
+        
+        count = 0
+        start = time.monotonic()
+        try:
+            for item in walker.walk(root, skip_dir, on_dir_done, exclude if self.filter else None,
+                                    on_page=lambda rel_path: self.index.commit()):
+                path = item.path
+                children[item.parent].append(item.name)
+                if item.is_dir and path not in reused:
+                    children[path] = []
+                    expanding[path] = item
+                else:
+                    self.index.upsert(side, item)
+                count += 1
+        except Exception:
+            self.index.rollback()
+            raise
+        
+        REFRESH_SECONDS.observe(time.monotonic() - start, side=side)
+        logger.info(
+            f"已列出 {root}: {walker.dir_count} 个目录，沿用索引 {len(reused)} 个目录，"
+            f"排除 {walker.excluded_count} 个条目，共 {count} 个条目"
+        )
+        return count
+    
+    def _walker(self):
+        """按客户端类型创建目录遍历器"""
+        sync = self.config['sync']
+        if isinstance(self.alist, BlockingAListAPI):
+            return AsyncTreeWalker(
+                self.alist,
+                max_workers=sync.get('list_concurrency', 32),
+                per_page=sync.get('list_page_size', 200)
+            )
+        return TreeWalker(
+            self.alist,
+            max_workers=sync.get('list_workers', 4),
+            per_page=sync.get('list_page_size', 200)
+        )
+    
+    def update_target(self, path: str) -> Optional[bool]:
+        """复制成功后确认目标端条目并写入索引，不重新列出整个目标目录
+        
+        文件只需一次 /api/fs/get；目录还要列出其子树（只列这一个目录），
+        否则之后的增量刷新会因目录指纹未变而跳过其内容，子条目被当作缺失再次复制。
+        
+        Args:
+            path: 相对路径
+            
+        Returns:
+            Optional[bool]: 目标端是否存在，请求失败无法确认时返回 None
+        """
+        info = self.alist.get_file_info(full_path(self.target, path))
+        if info is None:
+            return None
+        if not info:
+            return False
+        
+        entry = Entry.from_item(info, path.rpartition('/')[0])
+        if entry.is_dir:
+            try:
+                pages = self._walker().walk(full_path(self.target, path), on_page=lambda _: self.index.commit())
+                for child in pages:
+                    self.index.upsert(TARGET, child.rebase(path))
+            except WalkError as e:
+                logger.warning(f"列出已复制的目录失败，等待下次刷新: {e}")
+                self.index.rollback()
+                return None
+        # 目录条目在其内容写入后才写入，与 refresh_tree 一致
+        self.index.upsert(TARGET, entry)
+        self.index.commit()
+        return True
+    
+    def diff(self) -> Dict:
+        """对比源和目标目录树
+        
+        按文件级别分类，被过滤规则排除的条目不参与对比：
+        - new: 目标端不存在。整个缺失的目录只返回目录本身，
+          目录下有被排除的条目时改为返回其中需要复制的子条目
+        - changed: 两端都存在，但大小或同类哈希不一致（如复制不完整）
+        - deleted: 仅存在于目标端
+        - unchanged: 一致的文件数
+        
+        Returns:
+            Dict: 分类结果
+        """
+        result = {"new": [], "changed": [], "deleted": [], "unchanged": 0}
+        excluded = self.filter.excluded
+        for path, is_dir in self.index.missing_on_target():
+            if not excluded(path, is_dir):
+                result["new"].extend(self._expand_missing(path) if is_dir else [path])
+        for path, differs in self.index.compare_common():
+            if excluded(path):
+                continue
+            if differs:
+                result["changed"].append(path)
+            else:
+                result["unchanged"] += 1
+        result["deleted"] = [path for path in self.index.extra_on_target() if not excluded(path)]
+        return result
+    
+    def _expand_missing(self, path: str) -> List[str]:
+        """目标端缺失的目录
+        
+        整个目录复制时会连同被排除的条目一起复制，
+        因此目录下有被排除的条目时展开为需要复制的子条目，其余子目录仍整个复制。
+        """
+        if not self.index.has_excluded(SOURCE, path):
+            return [path]
+        result = []
+        for child, is_dir in self.index.children(SOURCE, path):
+            if self.filter.excluded(child, is_dir):
+                continue
+            result.extend(self._expand_missing(child) if is_dir else [child])
+        return result
     
     def get_new_files(self) -> List[str]:
-        """获取新文件列表"""
+        """获取新文件列表，并把其中没有在复制中的文件标记为待复制
+        
+        对比整个索引，每次刷新只需调用一次。
+        
+        Returns:
+            List[str]: 需要复制的相对路径（新增和内容不一致的条目）
+        """
         try:
-            # 读取源文件列表 (115网盘)
-            with open(self.src_cache_file, 'r', encoding='utf-8') as f:
-                src_data = json.load(f)
-            
-            # 读取目标缓存文件列表 (夸克网盘)
-            with open(self.dst_cache_file, 'r', encoding='utf-8') as f:
-                dst_data = json.load(f)
-            
-            # 比较文件列表
-            new_files = []
-            src_content = src_data.get("data", {}).get("content", [])
-            dst_content = dst_data.get("data", {}).get("content", [])
-            
-            # 创建目标文件名集合
-            dst_names = {item["name"] for item in dst_content}
-            
-            # 检查源文件是否在目标中存在
-            for item in src_content:
-                if item["name"] not in dst_names:
-                    new_files.append(item["name"])
-            
+            result = self.diff()
+            logger.info(
+                f"对比结果: 新增 {len(result['new'])}，不一致 {len(result['changed'])}，"
+                f"仅目标端存在 {len(result['deleted'])}，一致 {result['unchanged']}"
+            )
+            new_files = result["new"] + result["changed"]
+            self.index.mark_pending(new_files)
             return new_files
             
         except Exception as e:
             logger.error(f"获取新文件列表失败: {e}")
-            return []
\ No newline at end of file
+            return []
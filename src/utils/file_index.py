@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.api.entry import Entry
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "source"
+TARGET = "target"
+
+# 复制状态
+STATUS_PENDING = "pending"
+STATUS_COPYING = "copying"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    side TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    modified TEXT NOT NULL DEFAULT '',
+    hash TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (side, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries (side, parent);
+CREATE TABLE IF NOT EXISTS copy_status (
+    path TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    task_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_copy_status_status ON copy_status (status);
+CREATE TABLE IF NOT EXISTS excluded (
+    side TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    PRIMARY KEY (side, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_excluded_parent ON excluded (side, parent);
+"""
+
+
+def subtree_range(path: str) -> Tuple[str, str]:
+    """目录下所有后代路径的区间 [lo, hi)
+
+    '0' 是 '/' 之后的下一个字符，区间查询可以直接走主键索引。
+    """
+    return f"{path}/", f"{path}0"
+
+
+class FileIndex:
+    """基于 SQLite 的文件索引
+
+    以 WAL 模式保存源和目标两侧的目录树，以及每个文件的复制状态：
+    - 按目录增量更新，未变化的条目不会产生写入
+    - "目标端缺失" 等对比直接在 SQL 中完成，内存占用与目录树大小无关
+    - 每个线程使用独立连接，刷新时写事务按页提交，不在等待网络时占用写锁
+    """
+
+    def __init__(self, db_file: str):
+        """初始化索引
+
+        Args:
+            db_file: 数据库文件路径
+        """
+        self.db_file = db_file
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """获取当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def upsert(self, side: str, entry: Entry):
+        """写入一个条目，内容未变化时不产生写入
+
+        Args:
+            side: SOURCE 或 TARGET
+            entry: 列目录得到的条目
+        """
+        self._conn().execute(
+            """
+            INSERT INTO entries (side, path, parent, name, is_dir, size, modified, hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (side, path) DO UPDATE SET
+                is_dir = excluded.is_dir,
+                size = excluded.size,
+                modified = excluded.modified,
+                hash = excluded.hash
+            WHERE entries.is_dir != excluded.is_dir
+               OR entries.size != excluded.size
+               OR entries.modified != excluded.modified
+               OR entries.hash != excluded.hash
+            """,
+            (
+                side, entry.path, entry.parent, entry.name,
+                1 if entry.is_dir else 0, entry.size, entry.modified, entry.hash
+            )
+        )
+
+    def finish_dir(self, side: str, parent: str, names: Iterable[str], excluded: Iterable[str] = ()):
+        """目录列出完成：删除已不存在的子条目（连同其子树），记录被排除的子条目并提交
+
+        Args:
+            side: SOURCE 或 TARGET
+            parent: 目录相对路径，根目录为空字符串
+            names: 本次列出的子条目名称
+            excluded: 本次被过滤规则排除的子条目名称
+        """
+        conn = self._conn()
+        conn.execute("DELETE FROM excluded WHERE side = ? AND parent = ?", (side, parent))
+        conn.executemany(
+            "INSERT OR IGNORE INTO excluded (side, path, parent) VALUES (?, ?, ?)",
+            [(side, f"{parent}/{name}" if parent else name, parent) for name in excluded]
+        )
+        names = set(names)
+        stale = [
+            (path, is_dir) for path, name, is_dir in conn.execute(
+                "SELECT path, name, is_dir FROM entries WHERE side = ? AND parent = ?",
+                (side, parent)
+            ) if name not in names
+        ]
+        for path, is_dir in stale:
+            conn.execute("DELETE FROM entries WHERE side = ? AND path = ?", (side, path))
+            if is_dir:
+                lo, hi = subtree_range(path)
+                conn.execute(
+                    "DELETE FROM entries WHERE side = ? AND path >= ? AND path < ?",
+                    (side, lo, hi)
+                )
+                conn.execute(
+                    "DELETE FROM excluded WHERE side = ? AND path >= ? AND path < ?",
+                    (side, lo, hi)
+                )
+        conn.commit()
+
+    def rename(self, side: str, old_path: str, new_path: str):
+        """在索引中重命名条目及其子树，同时迁移复制状态（不提交）
+
+        Args:
+            side: SOURCE 或 TARGET
+            old_path: 原相对路径
+            new_path: 新相对路径
+        """
+        conn = self._conn()
+        conn.execute(
+            "UPDATE entries SET path = ?, parent = ?, name = ? WHERE side = ? AND path = ?",
+            (new_path, new_path.rpartition('/')[0], new_path.rpartition('/')[2], side, old_path)
+        )
+        lo, hi = subtree_range(old_path)
+        conn.execute(
+            """
+            UPDATE entries SET path = ? || substr(path, ?), parent = ? || substr(parent, ?)
+            WHERE side = ? AND path >= ? AND path < ?
+            """,
+            (new_path, len(old_path) + 1, new_path, len(old_path) + 1, side, lo, hi)
+        )
+        conn.execute(
+            """
+            UPDATE OR REPLACE excluded SET path = ? || substr(path, ?), parent = ? || substr(parent, ?)
+            WHERE side = ? AND path >= ? AND path < ?
+            """,
+            (new_path, len(old_path) + 1, new_path, len(old_path) + 1, side, lo, hi)
+        )
+        if side == SOURCE:
+            conn.execute("UPDATE OR REPLACE copy_status SET path = ? WHERE path = ?", (new_path, old_path))
+            conn.execute(
+                "UPDATE OR REPLACE copy_status SET path = ? || substr(path, ?) WHERE path >= ? AND path < ?",
+                (new_path, len(old_path) + 1, lo, hi)
+            )
+
+    def commit(self):
+        """提交当前线程的事务"""
+        self._conn().commit()
+
+    def rollback(self):
+        """回滚当前线程的事务"""
+        self._conn().rollback()
+
+    def get_fingerprint(self, side: str, path: str) -> Optional[Tuple]:
+        """获取条目指纹 (is_dir, size, modified, hash)"""
+        row = self._conn().execute(
+            "SELECT is_dir, size, modified, hash FROM entries WHERE side = ? AND path = ?",
+            (side, path)
+        ).fetchone()
+        if row is None:
+            return None
+        return bool(row[0]), row[1], row[2], row[3]
+
+    def get_sizes(self, side: str, paths: Iterable[str]) -> Dict[str, Tuple[int, str]]:
+        """获取条目的大小和修改时间，目录的大小为其下所有文件大小之和
+
+        Args:
+            side: SOURCE 或 TARGET
+            paths: 相对路径
+
+        Returns:
+            Dict[str, Tuple[int, str]]: 相对路径 -> (大小, 修改时间)，不存在的条目不返回
+        """
+        conn = self._conn()
+        result = {}
+        for path in paths:
+            row = conn.execute(
+                "SELECT is_dir, size, modified FROM entries WHERE side = ? AND path = ?",
+                (side, path)
+            ).fetchone()
+            if row is None:
+                continue
+            is_dir, size, modified = row
+            if is_dir:
+                lo, hi = subtree_range(path)
+                size = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries "
+                    "WHERE side = ? AND path >= ? AND path < ? AND is_dir = 0",
+                    (side, lo, hi)
+                ).fetchone()[0]
+            result[path] = (size, modified)
+        return result
+
+    def children(self, side: str, parent: str) -> List[Tuple[str, bool]]:
+        """目录的直接子条目
+
+        Returns:
+            List[Tuple[str, bool]]: (相对路径, 是否目录)
+        """
+        return [
+            (path, bool(is_dir)) for path, is_dir in self._conn().execute(
+                "SELECT path, is_dir FROM entries WHERE side = ? AND parent = ? ORDER BY path",
+                (side, parent)
+            )
+        ]
+
+    def has_excluded(self, side: str, path: str) -> bool:
+        """目录下是否有被过滤规则排除的条目"""
+        lo, hi = subtree_range(path)
+        return self._conn().execute(
+            "SELECT 1 FROM excluded WHERE side = ? AND path >= ? AND path < ? LIMIT 1",
+            (side, lo, hi)
+        ).fetchone() is not None
+
+    def count(self, side: str) -> int:
+        """条目总数"""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM entries WHERE side = ?", (side,)
+        ).fetchone()[0]
+
+    def missing_on_target(self) -> Iterator[Tuple[str, bool]]:
+        """源端存在、目标端缺失的条目
+
+        只返回父目录在目标端存在的条目，整个缺失的目录只返回目录本身。
+
+        Yields:
+            Tuple[str, bool]: (相对路径, 是否目录)
+        """
+        yield from self._conn().execute(
+            """
+            SELECT s.path, s.is_dir FROM entries s
+            WHERE s.side = 'source'
+              AND NOT EXISTS (SELECT 1 FROM entries t WHERE t.side = 'target' AND t.path = s.path)
+              AND (s.parent = ''
+                   OR EXISTS (SELECT 1 FROM entries p WHERE p.side = 'target' AND p.path = s.parent))
+            ORDER BY s.path
+            """
+        )
+
+    def extra_on_target(self) -> Iterator[str]:
+        """仅存在于目标端的条目（同样只返回最上层）"""
+        for (path,) in self._conn().execute(
+            """
+            SELECT t.path FROM entries t
+            WHERE t.side = 'target'
+              AND NOT EXISTS (SELECT 1 FROM entries s WHERE s.side = 'source' AND s.path = t.path)
+              AND (t.parent = ''
+                   OR EXISTS (SELECT 1 FROM entries p WHERE p.side = 'source' AND p.path = t.parent))
+            ORDER BY t.path
+            """
+        ):
+            yield path
+
+    def compare_common(self) -> Iterator[Tuple[str, bool]]:
+        """两端都存在的文件
+
+        大小或目录类型不一致视为不同；哈希只在两端提供同一种算法时比较。
+
+        Yields:
+            Tuple[str, bool]: (相对路径, 内容是否不同)
+        """
+        for path, s_size, t_size, t_is_dir, s_hash, t_hash in self._conn().execute(
+            """
+            SELECT s.path, s.size, t.size, t.is_dir, s.hash, t.hash
+            FROM entries s JOIN entries t ON t.side = 'target' AND t.path = s.path
+            WHERE s.side = 'source' AND s.is_dir = 0
+            """
+        ):
+            if t_is_dir or s_size != t_size:
+                yield path, True
+            elif s_hash and t_hash:
+                src, dst = json.loads(s_hash), json.loads(t_hash)
+                yield path, any(src[k] != dst[k] for k in src.keys() & dst.keys())
+            else:
+                yield path, False
+
+    def set_status(self, paths: Iterable[str], status: str,
+                   task_ids: Optional[Dict[str, str]] = None, error: Optional[str] = None):
+        """更新文件复制状态
+
+        Args:
+            paths: 相对路径
+            status: pending / copying / done / failed
+            task_ids: 相对路径 -> 任务ID
+            error: 失败原因
+        """
+        task_ids = task_ids or {}
+        now = datetime.now().isoformat()
+        conn = self._conn()
+        conn.executemany(
+            """
+            INSERT INTO copy_status (path, status, task_id, attempts, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                status = excluded.status,
+                task_id = COALESCE(excluded.task_id, copy_status.task_id),
+                attempts = copy_status.attempts + excluded.attempts,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+            """,
+            [
+                (path, status, task_ids.get(path), 1 if status == STATUS_COPYING else 0, error, now)
+                for path in paths
+            ]
+        )
+        conn.commit()
+
+    def mark_pending(self, paths: Iterable[str]):
+        """把文件标记为待复制，已提交复制任务（copying）的保持不变
+
+        Args:
+            paths: 相对路径
+        """
+        now = datetime.now().isoformat()
+        conn = self._conn()
+        conn.executemany(
+            """
+            INSERT INTO copy_status (path, status, task_id, attempts, error, updated_at)
+            VALUES (?, ?, NULL, 0, NULL, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                status = excluded.status,
+                error = NULL,
+                updated_at = excluded.updated_at
+            WHERE copy_status.status != ?
+            """,
+            [(path, STATUS_PENDING, now, STATUS_COPYING) for path in paths]
+        )
+        conn.commit()
+
+    def status_counts(self) -> Dict[str, int]:
+        """各复制状态的文件数"""
+        return dict(self._conn().execute(
+            "SELECT status, COUNT(*) FROM copy_status GROUP BY status"
+        ).fetchall())
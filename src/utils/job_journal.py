@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 事件类型
+EVENT_RESET = "reset"          # 新的一轮复制：待复制文件和已提交任务的快照
+EVENT_QUEUED = "queued"        # 新文件合并进待复制队列
+EVENT_SUBMITTED = "submitted"  # 复制任务已创建
+EVENT_DONE = "done"            # 复制成功
+EVENT_FAILED = "failed"        # 复制失败，retry 表示是否还会重试
+
+
+class JobJournal:
+    """同步任务的复制日志
+
+    以追加方式记录待复制文件和已创建的复制任务（含任务ID），每条事件一行 JSON，
+    写入后立即 fsync。启动时重放日志即可恢复上次未完成的工作：
+    - 已提交但尚未核对的任务交给调度器继续跟踪，不会重复提交
+    - 日志较新时直接恢复待复制队列，不必重新列出两端目录
+
+    内存中同步维护重放后的状态，每追加 compact_every 条事件
+    就用当前状态的快照重写日志，文件大小只与未完成的工作量有关。
+    """
+
+    def __init__(self, journal_file: str, compact_every: int = 1000):
+        """初始化复制日志并重放已有记录
+
+        Args:
+            journal_file: 日志文件路径
+            compact_every: 追加多少条事件后压缩一次
+        """
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self.queued = {}  # 相对路径 -> None，保持入队顺序
+        self.tasks = {}  # 相对路径 -> 任务ID
+        self.refreshed = 0.0  # 待复制队列所依据的文件列表的刷新时间
+        self._appended = 0
+        self._replay()
+
+    def _apply(self, event: dict):
+        """把一条事件应用到内存状态"""
+        kind = event.get("e")
+        if kind == EVENT_RESET:
+            self.queued = dict.fromkeys(event.get("queued") or [])
+            self.tasks = dict(event.get("tasks") or {})
+            self.refreshed = event.get("refreshed", 0.0)
+        elif kind == EVENT_QUEUED:
+            self.queued.update(dict.fromkeys(event["paths"]))
+            if event.get("refreshed") is not None:
+                self.refreshed = event["refreshed"]
+        elif kind == EVENT_SUBMITTED:
+            for path, task_id in event["tasks"].items():
+                self.queued.pop(path, None)
+                self.tasks[path] = task_id
+        elif kind == EVENT_DONE:
+            self.tasks.pop(event["path"], None)
+            self.queued.pop(event["path"], None)
+        elif kind == EVENT_FAILED:
+            self.tasks.pop(event["path"], None)
+            if event.get("retry"):
+                self.queued[event["path"]] = None
+            else:
+                self.queued.pop(event["path"], None)
+
+    def _replay(self):
+        """读取日志文件恢复状态，跳过写了一半的最后一行"""
+        if not os.path.exists(self.journal_file):
+            return
+        count = 0
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                        count += 1
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"跳过无法解析的复制日志记录: {line[:100]!r}")
+        except Exception as e:
+            logger.error(f"读取复制日志失败: {e}")
+            return
+        self._appended = count
+        if self.queued or self.tasks:
+            logger.info(
+                f"复制日志中有 {len(self.queued)} 个待复制文件，{len(self.tasks)} 个未核对的复制任务"
+            )
+
+    def _append(self, event: dict):
+        """追加一条事件并写入磁盘"""
+        with self._lock:
+            self._apply(event)
+            try:
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                logger.error(f"写入复制日志失败: {e}")
+                return
+            self._appended += 1
+            if self._appended >= self.compact_every:
+                self._compact()
+
+    def _compact(self):
+        """用当前状态的快照重写日志，调用方需持有锁"""
+        snapshot = {
+            "e": EVENT_RESET,
+            "t": time.time(),
+            "refreshed": self.refreshed,
+            "queued": list(self.queued),
+            "tasks": self.tasks
+        }
+        tmp_file = self.journal_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.journal_file)
+            self._appended = 1
+        except Exception as e:
+            logger.error(f"压缩复制日志失败: {e}")
+
+    def compact(self):
+        """立即压缩日志"""
+        with self._lock:
+            self._compact()
+
+    def reset(self, queued: Iterable[str], tasks: Optional[Dict[str, str]] = None,
+              refreshed: Optional[float] = None):
+        """开始新的一轮复制，用新的待复制文件替换日志内容
+
+        Args:
+            queued: 待复制文件
+            tasks: 仍在跟踪的已提交任务，相对路径 -> 任务ID
+            refreshed: 文件列表的刷新时间，默认为当前时间
+        """
+        with self._lock:
+            self.queued = dict.fromkeys(queued)
+            self.tasks = dict(tasks or {})
+            self.refreshed = time.time() if refreshed is None else refreshed
+            self._compact()
+
+    def is_fresh(self, max_age: float) -> bool:
+        """待复制队列所依据的文件列表是否在 max_age 秒内刷新过"""
+        return time.time() - self.refreshed <= max_age
+
+    def pending(self) -> List[str]:
+        """尚未提交的待复制文件"""
+        with self._lock:
+            return list(self.queued)
+
+    def in_flight(self) -> Dict[str, str]:
+        """已提交但尚未核对结果的任务，相对路径 -> 任务ID"""
+        with self._lock:
+            return dict(self.tasks)
+
+    def queue(self, paths: List[str], refreshed: Optional[float] = None):
+        """记录合并进待复制队列的文件
+
+        Args:
+            paths: 新加入的相对路径
+            refreshed: 这些文件所依据的文件列表的刷新时间，为空时不更新
+        """
+        if paths or refreshed is not None:
+            self._append({"e": EVENT_QUEUED, "t": time.time(), "paths": paths, "refreshed": refreshed})
+
+    def submitted(self, task_ids: Dict[str, str]):
+        """记录已创建的复制任务"""
+        if task_ids:
+            self._append({"e": EVENT_SUBMITTED, "t": time.time(), "tasks": task_ids})
+
+    def done(self, path: str):
+        """记录复制成功的文件"""
+        self._append({"e": EVENT_DONE, "t": time.time(), "path": path})
+
+    def failed(self, path: str, retry: bool):
+        """记录复制失败的文件"""
+        self._append({"e": EVENT_FAILED, "t": time.time(), "path": path, "retry": retry})
@@ -1,14 +1,123 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import threading
+import time
 from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 
-def setup_logger(log_dir: str = "logs"):
+# 当前的后台日志线程，重新配置或退出时停止
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """按 rate_key 限流
+    
+    调用方通过 extra={"rate_key": ...} 标记重复出现的日志（如任务进度），
+    同一个 key 在 interval 秒内只保留第一条；未标记的日志不受影响。
+    """
+    
+    def __init__(self, interval: float = 60):
+        super().__init__()
+        self.interval = interval
+        self.suppressed = 0
+        self._last = {}
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "rate_key", None)
+        if key is None or self.interval <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self.suppressed += 1
+                return False
+            self._last[key] = now
+            # 防止 key 无限增长
+            if len(self._last) > 10000:
+                self._last = {k: t for k, t in self._last.items() if now - t < self.interval}
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """有界队列日志处理器
+    
+    队列满时 INFO 及以下的日志直接丢弃并计数，不阻塞调用线程；
+    WARNING 及以上的日志最多等待 block_timeout 秒。
+    丢弃发生后，下一条成功入队的日志之前会补一条丢弃统计。
+    """
+    
+    def __init__(self, log_queue: queue.Queue, block_timeout: float = 1.0):
+        super().__init__(log_queue)
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._unreported = 0
+        self._lock = threading.Lock()
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self._unreported += 1
+            return
+        
+        if self._unreported:
+            with self._lock:
+                count, self._unreported = self._unreported, 0
+            if count:
+                notice = logging.LogRecord(
+                    __name__, logging.WARNING, __file__, 0,
+                    f"日志队列已满，丢弃了 {count} 条日志", None, None
+                )
+                try:
+                    self.queue.put_nowait(notice)
+                except queue.Full:
+                    with self._lock:
+                        self._unreported += count
+
+
+def setup_logger(log_dir: str = "logs", log_config: dict = None):
     """配置日志
     
+    默认使用队列模式：业务线程只把日志放入有界队列，
+    由后台线程写文件和控制台，不会阻塞在磁盘 I/O 上。
+    
     Args:
         log_dir: 日志目录路径，默认为 "logs"
+        log_config: 日志配置，支持以下字段：
+            async: 是否使用队列模式，默认 True
+            queue_size: 队列容量，默认 10000
+            format: "text" 或 "json"，默认 "text"
+            progress_interval: 同一 rate_key 日志的最短间隔（秒），默认 60
     """
+    global _listener
+    log_config = log_config or {}
+    
     # 确保日志目录存在
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
@@ -17,10 +126,13 @@ def setup_logger(log_dir: str = "logs"):
     log_file = os.path.join(log_dir, "copy_task.log")
     
     # 创建日志格式器
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if log_config.get('format', 'text') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     
     # 创建按天轮转的文件处理器
     file_handler = TimedRotatingFileHandler(
@@ -43,10 +155,47 @@ def setup_logger(log_dir: str = "logs"):
     logger.setLevel(logging.INFO)
     
     # 清除可能存在的旧处理器
+    stop_logging()
     logger.handlers.clear()
     
+    # 重复的进度日志限流，子记录器的日志不经过根记录器的过滤器，因此加在处理器上
+    rate_filter = RateLimitFilter(log_config.get('progress_interval', 60))
+    
     # 添加处理器
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    if log_config.get('async', True):
+        queue_handler = DroppingQueueHandler(queue.Queue(maxsize=log_config.get('queue_size', 10000)))
+        queue_handler.addFilter(rate_filter)
+        _listener = QueueListener(queue_handler.queue, file_handler, console_handler)
+        _listener.start()
+        logger.addHandler(queue_handler)
+    else:
+        file_handler.addFilter(rate_filter)
+        console_handler.addFilter(rate_filter)
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
     
-    return logger 
\ No newline at end of file
+    return logger
+
+
+def stop_logging():
+    """停止后台日志线程，写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    """日志丢弃和限流统计"""
+    root = logging.getLogger()
+    stats = {"dropped": 0, "rate_limited": 0}
+    filters = set()
+    for handler in root.handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            stats["dropped"] += handler.dropped
+        filters.update(f for f in handler.filters if isinstance(f, RateLimitFilter))
+    stats["rate_limited"] = sum(f.suppressed for f in filters)
+    return stats
+
+
+atexit.register(stop_logging)
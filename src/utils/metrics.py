@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# 默认的延迟分桶（秒）
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 刷新耗时分桶（秒）
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """组装 {a="1",b="2"} 形式的标签"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """指标基类，按标签值保存各个序列"""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: Tuple[str, ...], value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}"]
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """可任意设置的当前值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def set_function(self, func: Callable[[], float], **labels):
+        """读取时调用 func 计算当前值，用于随时间变化、无法在事件发生时更新的值"""
+        with self._lock:
+            self._series[self._key(labels)] = func
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            value = self._series.get(self._key(labels), 0)
+        return value() if callable(value) else value
+
+    def _render_series(self, key: Tuple[str, ...], value) -> List[str]:
+        return super()._render_series(key, value() if callable(value) else value)
+
+
+class Histogram(_Metric):
+    """固定分桶直方图，内存占用与观测次数无关"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各分桶计数..., +Inf 计数], 总和
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _render_series(self, key: Tuple[str, ...], value) -> List[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            labels = _format_labels(self.label_names, key, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """指标注册表，输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+ALIST_REQUEST_SECONDS = REGISTRY.histogram(
+    "alist_request_seconds", "AList API 请求耗时", ("endpoint", "method")
+)
+ALIST_REQUEST_ERRORS = REGISTRY.counter(
+    "alist_request_errors_total", "AList API 请求异常次数", ("endpoint",)
+)
+COPY_TASKS = REGISTRY.counter(
+    "alist_copy_tasks_total", "复制任务数", ("result",)
+)
+COPY_BYTES = REGISTRY.counter(
+    "alist_copy_bytes_total", "已成功复制的字节数"
+)
+COPY_BYTES_PER_SECOND = REGISTRY.gauge(
+    "alist_copy_bytes_per_second", "最近时间窗口内的复制速度"
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "alist_copy_queue_depth", "待提交的文件数（含等待重试）"
+)
+ACTIVE_TASKS = REGISTRY.gauge(
+    "alist_copy_active_tasks", "服务端未完成的复制任务数"
+)
+SLOT_UTILIZATION = REGISTRY.gauge(
+    "alist_copy_slot_utilization", "本轮调度的任务槽利用率 (0~1)"
+)
+THROTTLE_CONCURRENCY = REGISTRY.gauge(
+    "alist_throttle_concurrency", "AIMD 调整后的并发上限", ("endpoint_class",)
+)
+THROTTLE_EVENTS = REGISTRY.counter(
+    "alist_throttle_events_total", "因限流或出错缩减并发上限的次数", ("endpoint_class",)
+)
+POOL_EVENTS = REGISTRY.counter(
+    "alist_pool_events_total",
+    "连接池事件次数：hit 复用空闲连接、miss 新建连接、reconnect 空闲连接失效后重连、eviction 淘汰超时的空闲连接",
+    ("event",)
+)
+REFRESH_SECONDS = REGISTRY.histogram(
+    "alist_refresh_seconds", "目录树刷新耗时", ("side",), DURATION_BUCKETS
+)
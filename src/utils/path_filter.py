@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import re
+from typing import List, Optional, Pattern, Tuple
+
+
+def _translate(glob: str) -> str:
+    """把一段 gitignore 风格的通配符转换为正则表达式
+
+    * 和 ? 不跨越目录，** 匹配任意层目录，[...] 原样保留为字符集。
+    """
+    i, n = 0, len(glob)
+    parts = []
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            j = glob.find("]", i + 1)
+            if j == -1:
+                parts.append(re.escape(c))
+            else:
+                body = glob[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                i = j
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+
+def compile_rule(pattern: str) -> Tuple[Pattern, bool, bool]:
+    """编译一条规则
+
+    与 .gitignore 一致：
+    - 以 ! 开头表示取反（重新包含）
+    - 以 / 结尾只匹配目录
+    - 不含 / 的规则匹配任意层级的名称；含 / 的规则相对同步根目录匹配
+    规则同时匹配路径本身和其下的所有条目。
+
+    Returns:
+        Tuple: (正则, 是否取反, 是否只匹配目录)
+    """
+    negate = pattern.startswith("!")
+    if negate:
+        pattern = pattern[1:]
+    dir_only = pattern.endswith("/")
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.strip("/")
+    prefix = "^" if anchored else "^(?:.*/)?"
+    return re.compile(prefix + _translate(pattern) + "(/.*)?$"), negate, dir_only
+
+
+def match_rule(rule: Tuple[Pattern, bool, bool], path: str, is_dir: bool) -> bool:
+    """判断相对路径是否匹配 compile_rule 编译的规则（不考虑取反）"""
+    regex, _, dir_only = rule
+    match = regex.match(path)
+    if not match:
+        return False
+    # 只匹配目录的规则：路径本身是目录，或匹配的是其上级目录
+    return not dir_only or is_dir or match.group(1) is not None
+
+
+class PathFilter:
+    """同步路径过滤器
+
+    由 sync.exclude 和 sync.include 规则一次性编译而成，在列目录时剪掉被排除的子树，
+    对比结果中也会再次过滤（索引里可能还留有修改规则之前列出的条目）。
+    - exclude: 被排除的路径，后面的规则优先，可以用 ! 重新包含
+    - include: 非空时只同步匹配任一规则的文件，目录总是会被列出
+    """
+
+    def __init__(self, exclude: Optional[List[str]] = None, include: Optional[List[str]] = None):
+        """初始化过滤器
+
+        Args:
+            exclude: 排除规则
+            include: 包含规则
+        """
+        self.exclude = [compile_rule(p) for p in exclude or [] if p and not p.startswith("#")]
+        self.include = [compile_rule(p) for p in include or [] if p and not p.startswith("#")]
+
+    def __bool__(self) -> bool:
+        return bool(self.exclude or self.include)
+
+    def excluded(self, path: str, is_dir: bool = False) -> bool:
+        """判断相对路径是否被排除
+
+        Args:
+            path: 相对同步根目录的路径
+            is_dir: 是否为目录
+        """
+        for rule in reversed(self.exclude):
+            if match_rule(rule, path, is_dir):
+                if not rule[1]:
+                    return True
+                break
+        if self.include and not is_dir:
+            return not any(match_rule(rule, path, False) for rule in self.include if not rule[1])
+        return False
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.path_filter import compile_rule, match_rule
+
+logger = logging.getLogger(__name__)
+
+# 排序策略
+POLICY_FIFO = "fifo"          # 按列出顺序
+POLICY_SMALLEST = "smallest"  # 小文件优先，单位时间内完成的文件数最多
+POLICY_NEWEST = "newest"      # 最近修改的优先
+POLICY_BALANCED = "balanced"  # 部分任务槽复制大文件，其余任务槽复制小文件
+POLICIES = (POLICY_FIFO, POLICY_SMALLEST, POLICY_NEWEST, POLICY_BALANCED)
+
+
+def parse_modified(value: str) -> float:
+    """把 AList 返回的修改时间转换为时间戳，无法解析时返回 0"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class PendingQueue:
+    """待复制文件的优先队列
+
+    先按路径规则的优先级（数值大的优先），再按排序策略出队；
+    排序依据是列目录时已经保存在索引中的大小和修改时间，目录按其下文件总大小计算。
+    balanced 策略额外维护一个按大小倒序的堆，由调度器决定每次从哪一端取。
+    """
+
+    def __init__(self, policy: str = POLICY_FIFO, rules: Optional[List] = None,
+                 sizes: Optional[Dict[str, Tuple[int, str]]] = None):
+        """初始化队列
+
+        Args:
+            policy: 排序策略，见 POLICIES
+            rules: 路径优先级规则 [[通配符, 优先级], ...]，通配符与 sync.exclude 一样使用 gitignore 写法，
+                匹配相对路径，取第一个匹配的规则；队列不区分文件和目录，以 / 结尾的规则也匹配同名文件
+            sizes: 相对路径 -> (大小, 修改时间)
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"未知的排序策略: {policy}，可选 {', '.join(POLICIES)}")
+        self.policy = policy
+        self.rules = [(compile_rule(pattern), priority) for pattern, priority in rules or []]
+        self.sizes = sizes if sizes is not None else {}
+        self._heap = []    # (排序键, 序号, 相对路径)
+        self._large = []   # (优先级, -大小, 序号, 相对路径)，仅 balanced
+        self._live = {}    # 相对路径 -> 序号，出队或重新入队后旧的堆条目作废
+        self._seq = 0
+        self._front = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __bool__(self) -> bool:
+        return bool(self._live)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._live
+
+    def priority(self, path: str) -> int:
+        """路径规则的优先级，没有匹配的规则时为 0"""
+        for rule, priority in self.rules:
+            if match_rule(rule, path, True):
+                return priority
+        return 0
+
+    def size(self, path: str) -> int:
+        return self.sizes.get(path, (0, ""))[0]
+
+    def _key(self, path: str, seq: int) -> Tuple:
+        size, modified = self.sizes.get(path, (0, ""))
+        if self.policy in (POLICY_SMALLEST, POLICY_BALANCED):
+            order = size
+        elif self.policy == POLICY_NEWEST:
+            order = -parse_modified(modified)
+        else:
+            order = 0
+        return -self.priority(path), order, seq
+
+    def push(self, paths: Iterable[str], front: bool = False):
+        """加入待复制文件
+
+        Args:
+            paths: 相对路径
+            front: 是否排在同一优先级的最前面（重试和提交失败的文件）
+        """
+        for path in paths:
+            if front:
+                self._front -= 1
+                seq = self._front
+            else:
+                self._seq += 1
+                seq = self._seq
+            self._live[path] = seq
+            key = self._key(path, seq)
+            heapq.heappush(self._heap, (key, path))
+            if self.policy == POLICY_BALANCED:
+                heapq.heappush(self._large, ((key[0], -self.size(path), seq), path))
+
+    def _pop_from(self, heap: list, n: int) -> List[str]:
+        result = []
+        while heap and len(result) < n:
+            key, path = heapq.heappop(heap)
+            if self._live.get(path) == key[-1]:
+                del self._live[path]
+                result.append(path)
+        return result
+
+    def pop(self, n: int) -> List[str]:
+        """按排序策略取出最多 n 个文件"""
+        return self._pop_from(self._heap, n)
+
+    def pop_largest(self, n: int) -> List[str]:
+        """balanced 策略下取出最多 n 个最大的文件，其他策略返回空列表"""
+        if self.policy != POLICY_BALANCED:
+            return []
+        return self._pop_from(self._large, n)
+
+    def peek(self) -> Optional[str]:
+        """下一个出队的文件"""
+        while self._heap:
+            key, path = self._heap[0]
+            if self._live.get(path) == key[-1]:
+                return path
+            heapq.heappop(self._heap)
+        return None
+
+    def paths(self) -> List[str]:
+        """按出队顺序列出所有文件"""
+        return [path for _, path in sorted(
+            (key, path) for key, path in self._heap if self._live.get(path) == key[-1]
+        )]
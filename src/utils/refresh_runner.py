@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_RUNNING = "running"
+STATE_SUCCEEDED = "succeeded"
+STATE_FAILED = "failed"
+
+# 刷新函数接收一个进度回调 progress(已完成步数, 总步数, 说明)
+ProgressCallback = Callable[[int, int, str], None]
+
+
+class RefreshRunner:
+    """后台刷新任务（single-flight）
+
+    同一时间最多运行一次刷新：刷新进行中时再次请求（网页多次点击、定时刷新）
+    直接加入正在运行的刷新，得到同一个任务ID和同一个结果，不会重复列目录。
+    最近 history 次刷新的状态保存在内存中供查询。
+    """
+
+    def __init__(self, refresh: Callable[[ProgressCallback], Any], history: int = 20):
+        """初始化后台刷新
+
+        Args:
+            refresh: 刷新函数，参数为进度回调，返回值作为刷新结果
+            history: 保留的刷新记录数
+        """
+        self.refresh = refresh
+        self.history = history
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # 任务ID -> 状态
+        self._current = None  # 运行中的任务ID
+        self._finished = {}  # 任务ID -> threading.Event
+
+    def start(self) -> Tuple[dict, bool]:
+        """启动刷新，已有刷新在运行时加入该刷新
+
+        Returns:
+            Tuple[dict, bool]: (刷新状态, 是否新启动)
+        """
+        with self._lock:
+            if self._current:
+                record = self._records[self._current]
+                record["joined"] += 1
+                logger.info(f"刷新 {self._current} 正在进行，加入该刷新")
+                return dict(record), False
+
+            job_id = uuid.uuid4().hex[:12]
+            record = {
+                "id": job_id,
+                "state": STATE_RUNNING,
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "progress": {"done": 0, "total": 0, "message": "等待开始"},
+                "joined": 0,
+                "result": None,
+                "error": None
+            }
+            self._records[job_id] = record
+            self._finished[job_id] = threading.Event()
+            self._current = job_id
+            while len(self._records) > self.history:
+                old_id, _ = self._records.popitem(last=False)
+                self._finished.pop(old_id, None)
+
+        threading.Thread(target=self._run, args=(job_id,), name=f"refresh-{job_id}", daemon=True).start()
+        return dict(record), True
+
+    def _run(self, job_id: str):
+        """刷新线程"""
+        def progress(done: int, total: int, message: str = ""):
+            with self._lock:
+                self._records[job_id]["progress"] = {"done": done, "total": total, "message": message}
+
+        result, error = None, None
+        try:
+            result = self.refresh(progress)
+        except Exception as e:
+            logger.exception(f"刷新 {job_id} 失败")
+            error = str(e)
+
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is not None:
+                record["state"] = STATE_FAILED if error else STATE_SUCCEEDED
+                record["finished_at"] = datetime.now().isoformat()
+                record["result"] = result
+                record["error"] = error
+            self._current = None
+            finished = self._finished.get(job_id)
+        if finished:
+            finished.set()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """获取刷新状态，未知的任务ID返回 None"""
+        with self._lock:
+            record = self._records.get(job_id)
+            return dict(record) if record else None
+
+    def latest(self) -> Optional[dict]:
+        """最近一次刷新的状态"""
+        with self._lock:
+            return dict(next(reversed(self._records.values()))) if self._records else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """等待刷新结束或超时，返回当时的状态"""
+        with self._lock:
+            finished = self._finished.get(job_id)
+        if finished:
+            finished.wait(timeout)
+        return self.get(job_id)
+
+    def run(self) -> Any:
+        """启动或加入刷新并等待结果
+
+        Raises:
+            RuntimeError: 刷新失败
+        """
+        record, _ = self.start()
+        record = self.wait(record["id"])
+        if record is None:
+            raise RuntimeError("刷新记录已失效")
+        if record["state"] == STATE_FAILED:
+            raise RuntimeError(record["error"])
+        return record["result"]
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.api.alist_api import AListAPI
+from src.api.walker import TreeWalker, full_path, join_path
+from src.utils.file_index import FileIndex, SOURCE
+
+logger = logging.getLogger(__name__)
+
+# 默认只去掉单引号
+DEFAULT_RULES = [["'", ""]]
+
+
+class Sanitizer:
+    """文件名清理规则
+
+    规则为 [正则, 替换] 列表，按顺序作用于文件名（不含目录部分）。
+    """
+
+    def __init__(self, rules: Optional[Sequence[Sequence[str]]] = None):
+        self.rules = [
+            (re.compile(pattern), replacement)
+            for pattern, replacement in (DEFAULT_RULES if rules is None else rules)
+        ]
+
+    def clean(self, name: str) -> str:
+        """返回清理后的文件名，清理后为空时保留原名"""
+        cleaned = name
+        for pattern, replacement in self.rules:
+            cleaned = pattern.sub(replacement, cleaned)
+        return cleaned.strip() or name
+
+
+class FileRenamer:
+    """并发重命名源端文件
+
+    按父目录分组，用有界线程池并发提交重命名，
+    每个目录的重命名完成后列出该目录一次确认结果，
+    确认成功的条目直接在本地索引中改名，不再重新列出整个源目录树。
+    """
+
+    def __init__(self, alist_client: AListAPI, index: FileIndex, src_dir: str,
+                 rules: Optional[Sequence[Sequence[str]]] = None,
+                 max_workers: int = 4, per_page: int = 200, confirm_attempts: int = 3):
+        """初始化重命名器
+
+        Args:
+            alist_client: AList API 客户端
+            index: 文件索引
+            src_dir: 源目录
+            rules: 文件名清理规则
+            max_workers: 并发重命名的线程数
+            per_page: 确认时列目录的每页条目数
+            confirm_attempts: 列目录确认的最大次数
+        """
+        self.alist = alist_client
+        self.index = index
+        self.src_dir = src_dir
+        self.sanitizer = Sanitizer(rules)
+        self.max_workers = max_workers
+        self.walker = TreeWalker(alist_client, per_page=per_page)
+        self.confirm_attempts = confirm_attempts
+
+    def plan(self, paths: List[str]) -> Dict[str, str]:
+        """找出需要重命名的文件
+
+        Returns:
+            Dict[str, str]: 相对路径 -> 新文件名
+        """
+        plan = {}
+        for path in paths:
+            parent, _, name = path.rpartition('/')
+            new_name = self.sanitizer.clean(name)
+            if new_name == name:
+                continue
+            if self.index.get_fingerprint(SOURCE, join_path(parent, new_name)) is not None:
+                logger.warning(f"重命名目标已存在，保留原文件名: {path} -> {new_name}")
+                continue
+            plan[path] = new_name
+        return plan
+
+    def _confirm(self, parent: str, renames: Dict[str, str]) -> Dict[str, str]:
+        """列出目录确认重命名结果
+
+        Args:
+            parent: 目录相对路径
+            renames: 原文件名 -> 新文件名
+
+        Returns:
+            Dict[str, str]: 已确认的 原文件名 -> 新文件名
+        """
+        confirmed = {}
+        for attempt in range(self.confirm_attempts):
+            if attempt:
+                time.sleep(2 ** attempt)
+            try:
+                names = {
+                    item.name
+                    for items in self.walker.list_pages(full_path(self.src_dir, parent))
+                    for item in items
+                }
+            except Exception as e:
+                logger.warning(f"确认重命名时列目录失败: {full_path(self.src_dir, parent)} | {e}")
+                continue
+            confirmed = {old: new for old, new in renames.items() if new in names and old not in names}
+            if len(confirmed) == len(renames):
+                return confirmed
+        return confirmed
+
+    def _rename_one(self, path: str, new_name: str) -> bool:
+        """提交单个重命名"""
+        parent, _, name = path.rpartition('/')
+        if self.alist.rename_file(full_path(self.src_dir, parent), name, new_name):
+            return True
+        logger.error(f"重命名失败，保留原文件名: {path}")
+        return False
+
+    def _confirm_dir(self, parent: str, renamed: Dict[str, str],
+                     on_renamed: Optional[Callable[[str, str], None]]) -> Dict[str, str]:
+        """确认同一目录下的重命名，并更新本地索引"""
+        confirmed = self._confirm(parent, renamed)
+        for old in renamed.keys() - confirmed.keys():
+            logger.error(f"重命名未能确认，保留原文件名: {join_path(parent, old)}")
+
+        results = {}
+        try:
+            for old, new in confirmed.items():
+                old_path, new_path = join_path(parent, old), join_path(parent, new)
+                self.index.rename(SOURCE, old_path, new_path)
+                results[old_path] = new_path
+            self.index.commit()
+        finally:
+            self.index.close()
+
+        if on_renamed:
+            for old_path, new_path in results.items():
+                on_renamed(old_path, new_path)
+        return results
+
+    def rename(self, paths: List[str],
+               on_renamed: Optional[Callable[[str, str], None]] = None) -> Tuple[List[str], int]:
+        """重命名需要清理的文件
+
+        Args:
+            paths: 待处理的相对路径
+            on_renamed: 每个确认成功的重命名调用一次，参数为 (原路径, 新路径)
+
+        Returns:
+            Tuple[List[str], int]: (处理后的路径列表，顺序不变；失败的数量)
+        """
+        plan = self.plan(paths)
+        if not plan:
+            return list(paths), 0
+
+        logger.info(f"开始重命名 {len(plan)} 个文件")
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # 并发提交所有重命名
+            groups = {}
+            futures = {path: pool.submit(self._rename_one, path, new_name) for path, new_name in plan.items()}
+            for path, future in futures.items():
+                try:
+                    if future.result():
+                        parent, _, name = path.rpartition('/')
+                        groups.setdefault(parent, {})[name] = plan[path]
+                except Exception as e:
+                    logger.error(f"重命名过程出错: {path} | {e}")
+
+            # 每个目录只列出一次确认结果
+            futures = [
+                pool.submit(self._confirm_dir, parent, renamed, on_renamed)
+                for parent, renamed in groups.items()
+            ]
+            for future in futures:
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    logger.error(f"确认重命名出错: {e}")
+
+        return [results.get(path, path) for path in paths], len(plan) - len(results)
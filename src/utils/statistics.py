@@ -1,34 +1,99 @@
+import threading
+import time
+from collections import deque
 from datetime import datetime
 
+from src.utils.metrics import COPY_TASKS, COPY_BYTES, COPY_BYTES_PER_SECOND
+
+
 class TaskStatistics:
-    def __init__(self):
+    """复制任务统计
+
+    历史记录保存在固定长度的环形缓冲区中，吞吐采样按秒合并、只保留时间窗口内的，
+    内存占用不随运行时间增长；计数同时更新到 /metrics 指标，复制速度在读取指标时计算。
+    """
+
+    def __init__(self, history_size: int = 1000, window: float = 300):
+        """初始化统计
+
+        Args:
+            history_size: 保留的最近事件数
+            window: 计算复制速度的时间窗口（秒）
+        """
         self.total_tasks = 0
         self.completed_tasks = 0
         self.failed_tasks = 0
         self.total_files = 0
         self.total_size = 0
         self.start_time = datetime.now()
-        self.history = []
+        self.history = deque(maxlen=history_size)
+        self.window = window
+        self._samples = deque()  # [monotonic 整秒, 该秒内复制的字节数]
+        self._lock = threading.Lock()
+        COPY_BYTES_PER_SECOND.set_function(self.bytes_per_second)
 
     def add_task(self, task_info: dict):
-        self.total_tasks += 1
-        self.history.append({
-            "time": datetime.now().isoformat(),
-            "type": "new",
-            "task": task_info
-        })
-
-    def update_task(self, task_id: str, status: str, progress: int):
+        with self._lock:
+            self.total_tasks += 1
+            self.history.append({
+                "time": datetime.now().isoformat(),
+                "type": "new",
+                "task": task_info
+            })
+        COPY_TASKS.inc(result="created")
+
+    def update_task(self, task_id: str, status: str, progress: int, size: int = 0):
+        with self._lock:
+            if status == "succeeded":
+                self.completed_tasks += 1
+                self.total_files += 1
+                self.total_size += size
+                self._add_sample(size)
+            elif status == "failed":
+                self.failed_tasks += 1
+            else:
+                return
+            self.history.append({
+                "time": datetime.now().isoformat(),
+                "type": status,
+                "task": {"id": task_id, "progress": progress, "size": size}
+            })
+        COPY_TASKS.inc(result=status)
         if status == "succeeded":
-            self.completed_tasks += 1
-        elif status == "failed":
-            self.failed_tasks += 1
+            COPY_BYTES.inc(size)
+
+    def _add_sample(self, size: int):
+        """记录一次复制的字节数，同一秒内的合并为一条，须持有 self._lock"""
+        second = int(time.monotonic())
+        if self._samples and self._samples[-1][0] == second:
+            self._samples[-1][1] += size
+        else:
+            self._samples.append([second, size])
+        self._expire(second)
+
+    def _expire(self, now: float):
+        """丢弃时间窗口之外的采样，须持有 self._lock"""
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def bytes_per_second(self) -> float:
+        """最近 window 秒内的平均复制速度"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            copied = sum(size for _, size in self._samples)
+        elapsed = min(self.window, (datetime.now() - self.start_time).total_seconds())
+        return copied / elapsed if elapsed > 0 else 0.0
 
     def get_summary(self) -> dict:
+        finished = self.completed_tasks + self.failed_tasks
+        bytes_per_second = self.bytes_per_second()
         return {
             "total_tasks": self.total_tasks,
             "completed": self.completed_tasks,
             "failed": self.failed_tasks,
-            "success_rate": f"{(self.completed_tasks/self.total_tasks)*100:.2f}%",
+            "success_rate": f"{(self.completed_tasks/finished)*100:.2f}%" if finished else "N/A",
+            "bytes_copied": self.total_size,
+            "bytes_per_second": round(bytes_per_second, 1),
             "running_time": str(datetime.now() - self.start_time)
-        } 
\ No newline at end of file
+        }
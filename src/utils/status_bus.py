@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StatusBus:
+    """进程内共享的任务状态
+
+    工作线程调用 update() 发布状态，Web 端直接读取内存中的快照，
+    或用 wait() 等待下一个版本。状态文件只用于崩溃后恢复：
+    后台线程在 flush_interval 内合并多次更新，只写一次磁盘。
+    """
+
+    def __init__(self, status_file: str, flush_interval: float = 5.0):
+        """初始化状态总线
+
+        Args:
+            status_file: 状态文件路径
+            flush_interval: 写盘的合并间隔（秒）
+        """
+        self.status_file = status_file
+        self.flush_interval = flush_interval
+        # 以启动时间为初始版本，重启后浏览器带来的旧版本号不会大于新版本
+        self.version = int(time.time() * 1000)
+        self._status = self._load()
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="status-flush", daemon=True)
+        self._flusher.start()
+
+    def _load(self) -> dict:
+        """读取上次保存的状态"""
+        try:
+            if os.path.exists(self.status_file):
+                with open(self.status_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"读取状态文件失败: {e}")
+        return {}
+
+    def update(self, status: dict):
+        """发布新状态"""
+        with self._cond:
+            self._status = status
+            self.version += 1
+            self._dirty = True
+            self._cond.notify_all()
+
+    def snapshot(self) -> Tuple[int, dict]:
+        """获取当前版本和状态"""
+        with self._cond:
+            return self.version, self._status
+
+    def wait(self, since: int, timeout: Optional[float] = None) -> Tuple[int, dict]:
+        """等待版本号超过 since 的状态，超时返回当前状态
+
+        Args:
+            since: 已知的版本号
+            timeout: 最长等待时间（秒）
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since or self._closed, timeout)
+            return self.version, self._status
+
+    def flush(self):
+        """立即把当前状态写入磁盘"""
+        with self._cond:
+            if not self._dirty:
+                return
+            status = self._status
+            self._dirty = False
+
+        tmp_file = self.status_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(status, f, ensure_ascii=False)
+            os.replace(tmp_file, self.status_file)
+        except Exception as e:
+            logger.error(f"保存状态失败: {e}")
+
+    def _flush_loop(self):
+        """后台写盘线程"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._dirty or self._closed)
+                if self._closed:
+                    return
+            # 合并这段时间内的多次更新
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def close(self):
+        """停止后台线程并写入最终状态"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join(timeout=self.flush_interval + 1)
+        self.flush()
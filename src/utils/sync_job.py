@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+from typing import List
+
+from src.api.alist_api import AListAPI
+from src.utils.file_cache import FileCache
+from src.utils.job_journal import JobJournal
+
+logger = logging.getLogger(__name__)
+
+_NAME_PATTERN = re.compile(r'^[\w.-]+$')
+
+
+class SyncJob:
+    """同步任务
+
+    一组源目录 -> 目标目录的映射。每个同步任务有独立的缓存目录
+    （文件索引、刷新时间、复制日志）和待复制队列，AList 客户端和任务槽由所有同步任务共用。
+    """
+
+    def __init__(self, name: str, source: str, target: str, cache_dir: str,
+                 alist_client: AListAPI, config: dict):
+        """初始化同步任务
+
+        Args:
+            name: 同步任务名称
+            source: 源目录
+            target: 目标目录
+            cache_dir: 该同步任务的缓存目录
+            alist_client: AList API 客户端
+            config: 配置信息
+        """
+        self.name = name
+        self.source = source
+        self.target = target
+        self.cache = FileCache(cache_dir, alist_client, config, source, target)
+        self.journal = JobJournal(os.path.join(cache_dir, "journal.jsonl"))
+        self.pending_files = []
+        # 最近一次刷新对比出的待复制文件，刷新失败时为空
+        self.new_files = []
+
+    @staticmethod
+    def load(config: dict, cache_root: str, alist_client: AListAPI) -> List['SyncJob']:
+        """根据配置创建同步任务
+
+        配置了 sync.jobs 时，每个同步任务使用 cache_root/jobs/<name> 作为缓存目录；
+        否则按 sync.source / sync.target 创建名为 default 的单个同步任务，
+        沿用 cache_root 下已有的缓存。
+
+        Args:
+            config: 配置信息
+            cache_root: 缓存根目录
+            alist_client: AList API 客户端
+
+        Returns:
+            List[SyncJob]: 同步任务列表
+
+        Raises:
+            ValueError: 同步任务配置无效
+        """
+        sync = config['sync']
+        if not sync.get('jobs'):
+            return [SyncJob("default", sync['source'], sync['target'], cache_root, alist_client, config)]
+
+        jobs = []
+        names = set()
+        for i, job in enumerate(sync['jobs']):
+            name = job.get('name') or f"job{i + 1}"
+            if not _NAME_PATTERN.match(name):
+                raise ValueError(f"同步任务名称只能包含字母、数字、下划线、点和短横线: {name}")
+            if name in names:
+                raise ValueError(f"同步任务名称重复: {name}")
+            if not job.get('source') or not job.get('target'):
+                raise ValueError(f"同步任务 {name} 缺少 source 或 target")
+            names.add(name)
+            jobs.append(SyncJob(
+                name, job['source'], job['target'],
+                os.path.join(cache_root, "jobs", name), alist_client, config
+            ))
+        logger.info(f"已加载 {len(jobs)} 个同步任务: {', '.join(job.name for job in jobs)}")
+        return jobs
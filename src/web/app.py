@@ -1,35 +1,84 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 import logging
 import json
+import time
 from datetime import datetime
 import os
+from src.web.log_tail import tail_lines, read_new_lines
+from src.utils.metrics import REGISTRY
 
 logger = logging.getLogger(__name__)
 
 class TaskMonitor:
-    def __init__(self, log_dir: str, cache_dir: str, refresh_callback=None):
+    def __init__(self, log_dir: str, cache_dir: str, refresher=None, status_bus=None):
         self.log_dir = log_dir
         self.cache_dir = cache_dir
-        self.refresh_callback = refresh_callback
+        self.refresher = refresher
+        self.status_bus = status_bus
+        self.log_file = os.path.join(self.log_dir, "copy_task.log")
         
     def get_latest_logs(self, lines: int = 100) -> list:
         """获取最新的日志"""
-        log_file = os.path.join(
-            self.log_dir, 
-            "copy_task.log"
-        )
-        if not os.path.exists(log_file):
-            return []
+        return self.get_logs_since(None, lines)[0]
+    
+    def get_logs_since(self, offset: int = None, lines: int = 100) -> tuple:
+        """获取日志增量
+        
+        offset 为空时从文件末尾向前读取最后 lines 行，
+        否则只返回该偏移之后新增的行。
+        
+        Returns:
+            tuple: (日志行, 新的偏移)
+        """
+        if not os.path.exists(self.log_file):
+            return [], 0
             
         try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                return list(f.readlines())[-lines:]
+            if offset is None:
+                return tail_lines(self.log_file, lines)
+            new_lines, offset, _ = read_new_lines(self.log_file, offset)
+            return new_lines[-lines:], offset
         except Exception as e:
             logger.error(f"读取日志失败: {e}")
-            return []
+            return [], offset or 0
+    
+    def stream_logs(self, offset: int = None, poll_interval: float = 1.0, keepalive: float = 15.0):
+        """以 Server-Sent Events 格式持续推送新增日志
+        
+        每个事件的 id 为读取后的字节偏移，浏览器重连时通过 Last-Event-ID 续读。
+        """
+        inode = None
+        if offset is None:
+            lines, offset = self.get_logs_since(None)
+            if lines:
+                yield self._sse_event(lines, offset)
+        last_sent = time.monotonic()
+        
+        while True:
+            lines = []
+            if os.path.exists(self.log_file):
+                try:
+                    lines, offset, inode = read_new_lines(self.log_file, offset, inode)
+                except Exception as e:
+                    logger.error(f"读取日志失败: {e}")
+            if lines:
+                yield self._sse_event(lines, offset)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= keepalive:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(poll_interval)
+    
+    @staticmethod
+    def _sse_event(lines: list, offset: int) -> str:
+        """组装一个 SSE 事件，每行日志一个 data 字段"""
+        data = "".join(f"data: {line}\n" for line in lines)
+        return f"id: {offset}\n{data}\n"
     
     def get_task_status(self) -> dict:
         """获取任务状态"""
+        if self.status_bus:
+            return self.status_bus.snapshot()[1]
         try:
             status_file = os.path.join(self.cache_dir, "task_status.json")
             if not os.path.exists(status_file):
@@ -40,9 +89,42 @@ class TaskMonitor:
         except Exception as e:
             logger.error(f"读取状态失败: {e}")
             return {}
+    
+    def wait_task_status(self, since: int, timeout: float = 15.0) -> tuple:
+        """等待状态版本超过 since，返回 (版本, 状态)
+        
+        独立运行没有状态总线时，按状态文件的修改时间作为版本轮询。
+        """
+        if self.status_bus:
+            return self.status_bus.wait(since, timeout)
+        
+        status_file = os.path.join(self.cache_dir, "task_status.json")
+        deadline = time.monotonic() + timeout
+        while True:
+            version = int(os.path.getmtime(status_file) * 1000) if os.path.exists(status_file) else 0
+            if version > since or time.monotonic() >= deadline:
+                return version, self.get_task_status()
+            time.sleep(1)
+    
+    def stream_task_status(self, since: int = -1, keepalive: float = 15.0):
+        """以 Server-Sent Events 格式推送状态变化，事件 id 为状态版本"""
+        while True:
+            version, status = self.wait_task_status(since, keepalive)
+            if version > since:
+                since = version
+                yield f"id: {version}\ndata: {json.dumps(status, ensure_ascii=False)}\n\n"
+            else:
+                yield ": keepalive\n\n"
 
-def create_app(log_dir: str, cache_dir: str, refresh_callback=None) -> Flask:
-    """创建 Flask 应用"""
+def create_app(log_dir: str, cache_dir: str, refresher=None, status_bus=None) -> Flask:
+    """创建 Flask 应用
+    
+    Args:
+        log_dir: 日志目录
+        cache_dir: 缓存目录
+        refresher: 后台刷新任务 (RefreshRunner)，为空时不支持手动刷新
+        status_bus: 与工作线程共享的状态总线，为空时读取状态文件
+    """
     app = Flask(__name__)
     
     # 禁用 Flask 默认日志
@@ -51,7 +133,7 @@ def create_app(log_dir: str, cache_dir: str, refresh_callback=None) -> Flask:
     log.disabled = True
     
     # 初始化监控器
-    monitor = TaskMonitor(log_dir, cache_dir, refresh_callback)
+    monitor = TaskMonitor(log_dir, cache_dir, refresher, status_bus)
     
     @app.route('/')
     def index():
@@ -60,30 +142,71 @@ def create_app(log_dir: str, cache_dir: str, refresh_callback=None) -> Flask:
 
     @app.route('/api/logs')
     def get_logs():
-        """获取最新日志"""
-        logs = monitor.get_latest_logs()
-        return jsonify({"logs": logs})
+        """获取最新日志，传入 offset 时只返回之后新增的行"""
+        offset = request.args.get('offset', type=int)
+        logs, offset = monitor.get_logs_since(offset)
+        return jsonify({"logs": logs, "offset": offset})
+
+    @app.route('/api/logs/stream')
+    def stream_logs():
+        """以 Server-Sent Events 推送新增日志"""
+        offset = request.headers.get('Last-Event-ID', type=int)
+        if offset is None:
+            offset = request.args.get('offset', type=int)
+        return Response(
+            stream_with_context(monitor.stream_logs(offset)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
 
     @app.route('/api/status')
     def get_status():
-        """获取任务状态"""
-        status = monitor.get_task_status()
-        return jsonify(status)
+        """获取任务状态
+        
+        传入 since 时为长轮询：等到版本超过 since 或超时（timeout 秒）才返回。
+        """
+        since = request.args.get('since', type=int)
+        if since is None:
+            return jsonify(monitor.get_task_status())
+        timeout = min(request.args.get('timeout', 30, type=float), 60)
+        version, status = monitor.wait_task_status(since, timeout)
+        return jsonify({"version": version, "status": status})
+
+    @app.route('/api/status/stream')
+    def stream_status():
+        """以 Server-Sent Events 推送状态变化"""
+        since = request.headers.get('Last-Event-ID', -1, type=int)
+        return Response(
+            stream_with_context(monitor.stream_task_status(since)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus 指标"""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
         
     @app.route('/api/refresh', methods=['POST'])
     def refresh_files():
-        """手动刷新文件列表"""
+        """在后台刷新文件列表，立即返回刷新任务ID
+        
+        已有刷新在进行时加入该刷新，返回同一个任务ID。
+        """
         try:
-            if monitor.refresh_callback:
-                result = monitor.refresh_callback()
+            if not monitor.refresher:
                 return jsonify({
-                    "success": True,
-                    "message": "刷新成功" if result else "没有新文件"
+                    "success": False,
+                    "message": "刷新功能未初始化"
                 })
+            record, started = monitor.refresher.start()
             return jsonify({
-                "success": False,
-                "message": "刷新功能未初始化"
-            })
+                "success": True,
+                "job_id": record["id"],
+                "joined": not started,
+                "message": "已开始刷新" if started else "刷新正在进行，已加入",
+                "status": record
+            }), 202
         except Exception as e:
             logger.error(f"刷新失败: {e}")
             return jsonify({
@@ -91,6 +214,20 @@ def create_app(log_dir: str, cache_dir: str, refresh_callback=None) -> Flask:
                 "message": f"刷新失败: {str(e)}"
             })
     
+    @app.route('/api/refresh/<job_id>')
+    def refresh_status(job_id):
+        """查询刷新任务的状态和进度
+        
+        传入 wait 时为长轮询：等到刷新结束或超时（wait 秒）才返回。
+        """
+        if not monitor.refresher:
+            return jsonify({"success": False, "message": "刷新功能未初始化"}), 404
+        wait = min(request.args.get('wait', 0, type=float), 60)
+        record = monitor.refresher.wait(job_id, wait) if wait > 0 else monitor.refresher.get(job_id)
+        if record is None:
+            return jsonify({"success": False, "message": f"未知的刷新任务: {job_id}"}), 404
+        return jsonify(record)
+    
     return app
 
 if __name__ == '__main__':
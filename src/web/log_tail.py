@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import os
+from typing import List, Optional, Tuple
+
+
+def tail_lines(path: str, lines: int = 100, block_size: int = 8192) -> Tuple[List[str], int]:
+    """从文件末尾向前读取最后若干行
+
+    只读取末尾必要的数据块，耗时与文件大小无关。
+
+    Args:
+        path: 文件路径
+        lines: 行数
+        block_size: 每次向前读取的字节数
+
+    Returns:
+        Tuple[List[str], int]: (最后若干行, 文件末尾的字节偏移)
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        pos = end
+        data = b""
+        # 多读一行，保证第一行是完整的
+        while pos > 0 and data.count(b"\n") <= lines:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+
+    # 末尾尚未写完的半行留给 read_new_lines
+    partial = len(data) - data.rfind(b"\n") - 1
+    if partial == len(data):
+        return [], pos
+    data = data[:len(data) - partial]
+    end -= partial
+
+    result = data.decode('utf-8', errors='replace').splitlines()
+    if pos > 0:
+        result = result[1:]
+    return result[-lines:] if lines else [], end
+
+
+def read_new_lines(path: str, offset: int, inode: Optional[int] = None,
+                   max_bytes: int = 1 << 20) -> Tuple[List[str], int, int]:
+    """读取 offset 之后新增的完整行
+
+    日志轮转（文件变小或 inode 变化）后从新文件开头读起；
+    末尾尚未写完的半行留到下次读取。
+
+    Args:
+        path: 文件路径
+        offset: 上次读取结束的字节偏移
+        inode: 上次读取时文件的 inode，未知时为 None
+        max_bytes: 单次最多读取的字节数
+
+    Returns:
+        Tuple[List[str], int, int]: (新增的行, 新的偏移, 当前 inode)
+    """
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size < offset or (inode is not None and stat.st_ino != inode):
+            offset = 0
+        f.seek(offset)
+        data = f.read(max_bytes)
+
+    complete = data.rfind(b"\n") + 1
+    if complete == 0:
+        return [], offset, stat.st_ino
+    text = data[:complete].decode('utf-8', errors='replace')
+    return text.splitlines(), offset + complete, stat.st_ino